@@ -21,8 +21,24 @@ else:
 del os, get_distribution, DistributionNotFound
 del _dist, _dist_loc, _here
 
+from .batching import *
+from .cache import *
+from .codec import *
 from .grouper import *
+from .hedging import *
+from .limits import *
+from .loader import *
+from .matrix import *
 from .group import *
+from .membership import *
+from .metrics import *
+from .paging import *
 from .query import *
+from .retry import *
+from .save import *
+from .snapshot import *
 from .stem import *
+from .streaming import *
+from .sync import *
 from .subject import *
+from .tree import *
@@ -0,0 +1,119 @@
+import asyncio
+import collections
+
+from .exceptions import GrouperException
+
+__all__ = ['Coalescer', 'SingleFlight']
+
+
+class Coalescer:
+    """
+    Gathers concurrent single-item calls that share a key into one batched call.
+
+    Items submitted for the same key are held for up to `window` seconds, or until `max_batch_size` have
+    accumulated, and then passed together to `fetch(key, items)`, with any repeated items sent once. That coroutine
+    must return a dict mapping items to results, which are looked up for the individual callers; a caller whose item
+    is missing from it gets a GrouperException.
+    """
+    def __init__(self, fetch, *, window=0.003, max_batch_size=100):
+        assert window >= 0 and max_batch_size >= 1
+        self._fetch = fetch
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self._pending = {}
+        # Batch size -> number of batches of that size sent
+        self.batch_sizes = collections.Counter()
+
+    @property
+    def calls(self):
+        return sum(size * count for size, count in self.batch_sizes.items())
+
+    @property
+    def batches(self):
+        return sum(self.batch_sizes.values())
+
+    async def submit(self, key, item):
+        loop = asyncio.get_event_loop()
+        future = loop.create_future()
+        try:
+            items, futures, handle = self._pending[key]
+        except KeyError:
+            items, futures = [], []
+            handle = loop.call_later(self.window, self._flush, key)
+            self._pending[key] = items, futures, handle
+        items.append(item)
+        futures.append(future)
+        if len(items) >= self.max_batch_size:
+            self._flush(key)
+        return await future
+
+    def _flush(self, key):
+        try:
+            items, futures, handle = self._pending.pop(key)
+        except KeyError:
+            return
+        handle.cancel()
+        self.batch_sizes[len(items)] += 1
+        asyncio.ensure_future(self._run(key, items, futures))
+
+    async def _run(self, key, items, futures):
+        try:
+            results = await self._fetch(key, list(collections.OrderedDict.fromkeys(items)))
+        except Exception as e:
+            for future in futures:
+                if not future.done():
+                    future.set_exception(e)
+            return
+        for item, future in zip(items, futures):
+            if future.done():
+                continue
+            try:
+                future.set_result(results[item])
+            except KeyError:
+                future.set_exception(GrouperException('No result for {!r} in batched response'.format(item)))
+
+    def __str__(self):
+        return '<Coalescer {} calls in {} batches>'.format(self.calls, self.batches)
+    __repr__ = __str__
+
+
+class SingleFlight:
+    """
+    Shares one in-flight call between concurrent callers with the same key.
+
+    The first caller for a key starts the call; anyone else asking for that key before it completes waits for the
+    same result (or exception). Nothing is kept afterwards. A caller being cancelled doesn't cancel the shared call,
+    as others may be waiting on it.
+    """
+    def __init__(self):
+        self._in_flight = {}
+        self.calls = 0
+        self.deduplicated = 0
+
+    async def do(self, key, call):
+        """
+        :param call: Returns a coroutine to run if there's nothing in flight for key
+        """
+        self.calls += 1
+        task = self._in_flight.get(key)
+        if task is None:
+            task = self._in_flight[key] = asyncio.ensure_future(call())
+            task.add_done_callback(lambda t: self._done(key, t))
+        else:
+            self.deduplicated += 1
+        return await asyncio.shield(task)
+
+    def _done(self, key, task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
+        if not task.cancelled():
+            # Stops asyncio complaining if every caller has gone away
+            task.exception()
+
+    @property
+    def in_flight(self):
+        return len(self._in_flight)
+
+    def __str__(self):
+        return '<SingleFlight {} calls, {} deduplicated>'.format(self.calls, self.deduplicated)
+    __repr__ = __str__
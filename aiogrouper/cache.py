@@ -0,0 +1,99 @@
+import collections
+import time
+
+__all__ = ['Cache']
+
+
+class Cache:
+    """
+    A size-bounded LRU cache of Grouper read results, with a TTL per operation.
+
+    Keys are (operation, key) pairs. Operations without a positive TTL in `ttls` aren't cached at all. Hits and misses
+    are counted per operation.
+
+    Each operation has a generation, which moves on whenever any of its entries is invalidated. A result fetched
+    while that happened may predate the change, so set() drops it if given the generation from before the fetch.
+    """
+    default_ttls = {
+        'find_groups': 300,
+        'find_stems': 300,
+        'get_members': 60,
+    }
+
+    def __init__(self, maxsize=10000, ttls=None):
+        assert maxsize > 0
+        self.maxsize = maxsize
+        self.ttls = dict(self.default_ttls)
+        if ttls:
+            self.ttls.update(ttls)
+        self._entries = collections.OrderedDict()
+        self.hits = collections.Counter()
+        self.misses = collections.Counter()
+        self.evictions = 0
+        self._generations = collections.Counter()
+
+    def enabled(self, operation):
+        return bool(self.ttls.get(operation))
+
+    def get(self, operation, key, default=None):
+        if not self.enabled(operation):
+            return default
+        try:
+            expires, value = self._entries[operation, key]
+        except KeyError:
+            self.misses[operation] += 1
+            return default
+        if expires < time.monotonic():
+            del self._entries[operation, key]
+            self.misses[operation] += 1
+            return default
+        self._entries.move_to_end((operation, key))
+        self.hits[operation] += 1
+        return value
+
+    def generation(self, operation):
+        return self._generations[operation]
+
+    def set(self, operation, key, value, generation=None):
+        if not self.enabled(operation) or generation is not None and generation != self._generations[operation]:
+            return
+        self._entries[operation, key] = time.monotonic() + self.ttls[operation], value
+        self._entries.move_to_end((operation, key))
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, operation, key):
+        """
+        Drops an entry, returning its value if there was one.
+        """
+        self._generations[operation] += 1
+        entry = self._entries.pop((operation, key), None)
+        return entry[1] if entry is not None else None
+
+    def invalidate_operation(self, operation, kind=None):
+        """
+        Drops all entries for an operation, or only those whose key is a tuple starting with `kind`.
+        """
+        self._generations[operation] += 1
+        for entry_key in list(self._entries):
+            if entry_key[0] == operation and (kind is None or entry_key[1][0] == kind):
+                del self._entries[entry_key]
+
+    def clear(self):
+        for operation in set(self.ttls) | set(self._generations):
+            self._generations[operation] += 1
+        self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def stats(self):
+        return {operation: {'hits': self.hits[operation], 'misses': self.misses[operation]}
+                for operation in set(self.hits) | set(self.misses)}
+
+    def __str__(self):
+        return '<Cache {}/{} entries, {} hits, {} misses>'.format(len(self), self.maxsize,
+                                                                  sum(self.hits.values()), sum(self.misses.values()))
+    __repr__ = __str__
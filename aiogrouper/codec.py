@@ -0,0 +1,57 @@
+import json
+
+__all__ = ['JSONCodec', 'OrjsonCodec', 'UjsonCodec', 'get_codec']
+
+
+class JSONCodec(object):
+    """
+    Encodes request bodies to bytes and decodes response bodies, using the standard library's json module.
+    """
+    name = 'json'
+
+    def dumps(self, obj):
+        return json.dumps(obj, separators=(',', ':')).encode('utf-8')
+
+    def loads(self, data):
+        return json.loads(data.decode('utf-8') if isinstance(data, bytes) else data)
+
+    def __str__(self):
+        return '<{}>'.format(type(self).__name__)
+    __repr__ = __str__
+
+
+class OrjsonCodec(JSONCodec):
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self.dumps, self.loads = orjson.dumps, orjson.loads
+
+
+class UjsonCodec(JSONCodec):
+    name = 'ujson'
+
+    def __init__(self):
+        import ujson
+        self._ujson = ujson
+        self.loads = ujson.loads
+
+    def dumps(self, obj):
+        return self._ujson.dumps(obj, ensure_ascii=False).encode('utf-8')
+
+
+_codecs = [OrjsonCodec, UjsonCodec, JSONCodec]
+
+
+def get_codec(name=None):
+    """
+    Returns a codec by name ('json', 'orjson' or 'ujson'), or the fastest one installed if no name is given.
+    """
+    for codec in _codecs:
+        if name is None or codec.name == name:
+            try:
+                return codec()
+            except ImportError:
+                if name is not None:
+                    raise
+    raise ValueError("Unknown JSON codec: {!r}".format(name))
@@ -1,6 +1,6 @@
 import enum
 
-__all__ = ['FieldType', 'StemScope', 'CompositeType', 'PermissionAssignment', 'SaveMode', 'PrivilegeName']
+__all__ = ['FieldType', 'StemScope', 'CompositeType', 'PermissionAssignment', 'SaveMode', 'PrivilegeName', 'MemberFilter']
 
 
 class FieldType(enum.Enum):
@@ -26,6 +26,14 @@ class PermissionAssignment(enum.Enum):
     remove = 'remove_permission'
 
 
+class MemberFilter(enum.Enum):
+    all = 'All'
+    immediate = 'Immediate'
+    effective = 'Effective'
+    composite = 'Composite'
+    non_immediate = 'NonImmediate'
+
+
 class SaveMode(enum.Enum):
     insert = 'INSERT'
     update = 'UPDATE'
@@ -48,5 +56,21 @@ class ResultCode(enum.Enum):
     success = 'SUCCESS'
     success_wasnt_immediate = 'SUCCESS_WASNT_IMMEDIATE'
     subject_not_found = 'SUBJECT_NOT_FOUND'
+    success_group_not_found = 'SUCCESS_GROUP_NOT_FOUND'
+    success_stem_not_found = 'SUCCESS_STEM_NOT_FOUND'
+    insufficient_privileges = 'INSUFFICIENT_PRIVILEGES'
+    invalid_query = 'INVALID_QUERY'
+    exception = 'EXCEPTION'
+    success_inserted = 'SUCCESS_INSERTED'
+    success_updated = 'SUCCESS_UPDATED'
+    success_no_changes_needed = 'SUCCESS_NO_CHANGES_NEEDED'
+    group_not_found = 'GROUP_NOT_FOUND'
+    stem_not_found = 'STEM_NOT_FOUND'
+    group_already_exists = 'GROUP_ALREADY_EXISTS'
+    stem_already_exists = 'STEM_ALREADY_EXISTS'
+
+    @property
+    def is_success(self):
+        return self.value.startswith('SUCCESS')
 
 ResultCode.inverse = {m.value: m for m in ResultCode.__members__.values()}
@@ -13,6 +13,46 @@ class GrouperHTTPException(GrouperException):
         self.body = body
 
 
+class GrouperCircuitOpenException(GrouperException):
+    """
+    Raised without contacting Grouper while the circuit breaker considers it unhealthy.
+    """
+    def __init__(self, retry_after):
+        self.retry_after = retry_after
+        super().__init__('Grouper circuit breaker is open; retry in {:.1f}s'.format(retry_after))
+
+
+class GrouperTimeoutException(GrouperException):
+    """
+    Raised when a call hasn't completed within its deadline, whether it was waiting to be sent, waiting for Grouper,
+    or reading the response.
+    """
+    def __init__(self, timeout, method, url):
+        self.timeout, self.method, self.url = timeout, method, url
+        super().__init__('Grouper request took longer than {:.3g}s: {} {}'.format(timeout, method, url))
+
+
+class GrouperSaveException(GrouperException):
+    """
+    Raised by save_groups and save_stems when not everything could be saved. The rest were still saved; `result` is
+    the SaveResult, with the outcome and any error for each object.
+    """
+    def __init__(self, result):
+        self.result = result
+        super().__init__('{} of {} could not be saved'.format(len(result.failed), len(result.to_saves)))
+
+
+class GrouperMembershipException(GrouperException):
+    """
+    Raised by add_members and delete_members when some of their batches failed. The other batches were still sent;
+    `results` maps each subject in those to its ResultCode, and `errors` maps each subject in a failed batch to the
+    exception it failed with.
+    """
+    def __init__(self, results, errors):
+        self.results, self.errors = results, errors
+        super().__init__('{} of {} members could not be sent'.format(len(errors), len(results) + len(errors)))
+
+
 class GrouperAPIException(GrouperException):
     result_code = 'EXCEPTION'
 
@@ -27,6 +67,10 @@ class GrouperAPIException(GrouperException):
                                          self.input, self.output)
 
 
+class ProblemSavingGroups(GrouperAPIException):
+    result_code = 'PROBLEM_SAVING_GROUPS'
+
+
 class ProblemSavingStems(GrouperAPIException):
     result_code = 'PROBLEM_SAVING_STEMS'
 
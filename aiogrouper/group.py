@@ -1,4 +1,4 @@
-import asyncio
+import copy
 
 from .subject import Subject
 
@@ -9,12 +9,14 @@ __all__ = ['Group', 'CompositeGroup', 'GroupToSave']
 
 
 class Group:
+    __slots__ = ('grouper', '_name', '_uuid', 'extension', 'display_extension', '__weakref__')
+
     def __init__(self, grouper, name=None, uuid=None,
                  extension=None, display_extension=None, **kwargs):
         assert name or uuid
         self.grouper = grouper
-        self.name = name
-        self.uuid = uuid
+        self._name = name
+        self._uuid = uuid
         self.extension = extension
         self.display_extension = display_extension
 
@@ -53,16 +55,51 @@ class Group:
     def as_subject(self):
         return Subject(identifier=self.name, source='g:gsa')
 
-    @asyncio.coroutine
-    def save(self, **kwargs):
-        return (yield from self.grouper.save_group(GroupToSave(self, **kwargs)))
+    async def save(self, **kwargs):
+        return await self.grouper.save_group(GroupToSave(self, **kwargs))
+
+    # Read-only, as a Group is hashed by them; a renamed group is a new Group
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def uuid(self):
+        return self._uuid
+
+    def renamed(self, name):
+        """
+        Returns a copy of this Group with a different name, e.g. to save as a rename of this one.
+        """
+        group = copy.copy(self)
+        group._name = name
+        return group
+
+    def _refresh(self, other):
+        """
+        Brings this Group up to date from a newer copy of it, returning False (and changing nothing) if the copy has
+        a different name or uuid.
+        """
+        if type(other) is not type(self) or (other.name, other.uuid) != (self._name, self._uuid):
+            return False
+        self.extension, self.display_extension = other.extension, other.display_extension
+        return True
+
+    @property
+    def key(self):
+        """
+        What a Group is compared and hashed by: its name, or its uuid if it doesn't have a name. The two aren't
+        mixed, so that equality stays symmetric and transitive.
+        """
+        return ('name', self.name) if self.name else ('uuid', self.uuid)
 
     def __eq__(self, other):
-        return (self.name == other.name) if self.name else \
-               (self.uuid == other.uuid) if self.uuid else False
+        if not isinstance(other, Group):
+            return NotImplemented
+        return self.key == other.key
 
     def __hash__(self):
-        return (hash(self.__class__) << 2) ^ (hash(self.name) << 1) ^ hash(self.uuid)
+        return hash((Group, self.key))
 
     def __str__(self):
         return '<Group {}: {!r}>'.format(self.name or self.uuid, self.display_extension)
@@ -70,6 +107,8 @@ class Group:
 
 
 class CompositeGroup(Group):
+    __slots__ = ('composite_type', 'left', 'right')
+
     def __init__(self, *, composite_type, left, right, **kwargs):
         self.composite_type = composite_type
         self.left, self.right = left, right
@@ -90,6 +129,12 @@ class CompositeGroup(Group):
         return Subject(identifier=self.name, source='g:gsa',
                        name=self.display_extension)
 
+    def _refresh(self, other):
+        if not super()._refresh(other):
+            return False
+        self.composite_type, self.left, self.right = other.composite_type, other.left, other.right
+        return True
+
     @classmethod
     def from_json(cls, data, grouper):
         return cls(display_extension=data.get('displayExtension'),
@@ -102,6 +147,8 @@ class CompositeGroup(Group):
 
 
 class GroupToSave(object):
+    __slots__ = ('group', 'group_lookup', 'save_mode', 'create_parent_stems_if_not_exist')
+
     def __init__(self, group, *,
                  group_lookup=None,
                  save_mode=SaveMode.insert_or_update,
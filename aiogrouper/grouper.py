@@ -5,94 +5,496 @@ import http
 import json
 import logging
 import time
-from urllib.parse import urljoin
+import weakref
+from urllib.parse import urljoin, urlencode
 
 import aiohttp
 
-from .enum import FieldType, StemScope, SaveMode, PrivilegeName, ResultCode
-from .exceptions import api_exceptions, GrouperAPIException, GrouperDeserializeException, GrouperHTTPException, \
-    ProblemDeletingGroups, ProblemDeletingStems
+from .batching import Coalescer, SingleFlight
+from .codec import get_codec
+from .enum import FieldType, MemberFilter, StemScope, SaveMode, PrivilegeName, ResultCode
+from .exceptions import api_exceptions, GrouperException, GrouperAPIException, GrouperDeserializeException, \
+    GrouperHTTPException, GrouperMembershipException, GrouperSaveException, GrouperTimeoutException, ProblemDeletingGroups, ProblemDeletingStems, ProblemSavingGroups, \
+    ProblemSavingStems
 from .group import Group, GroupToSave
+from .limits import ConcurrencyLimiter, TokenBucket
+from .matrix import MembershipMatrix
+from .membership import MembershipChanges
+from .metrics import RequestEvent, notify
+from .paging import PageIterator
 from .query import Query, FindByStemName, FindByParentStemName
-from .stem import Stem, StemToSave
+from .retry import is_idempotent, READ_REQUESTS
+from .save import SaveResult
+from .stem import Stem, StemToSave, RecursiveDeleteResult
+from .streaming import MembershipParser, MembershipStream
 from .subject import Subject
-from .util import tf_to_bool, bool_to_tf
+from .tree import StemTree
+from .util import tf_to_bool, bool_to_tf, chunks, bounded_gather
 
 __all__ = ['Grouper']
 
 logger = logging.getLogger('aiogrouper')
 
+
+def _save_phases(to_saves, saving, nested, concurrency):
+    """
+    Orders saves parents-first, as a sequence of (to_saves, concurrency) phases to be run one after another.
+
+    Nested objects are split into levels by depth. Within a level, where create_parent_stems_if_not_exist is set, one
+    object per missing parent stem is saved before the rest, one batch at a time, so that concurrent batches don't
+    race to create the same stem.
+    """
+    levels = collections.OrderedDict()
+    for to_save in to_saves:
+        levels.setdefault(saving(to_save).name.count(':') if nested else 0, []).append(to_save)
+    names = {saving(to_save).name for to_save in to_saves} if nested else set()
+    for depth in sorted(levels):
+        first, rest, parents = [], [], set()
+        for to_save in levels[depth]:
+            parent = saving(to_save).name.rpartition(':')[0]
+            if to_save.create_parent_stems_if_not_exist and parent and parent not in names and parent not in parents:
+                parents.add(parent)
+                first.append(to_save)
+            else:
+                rest.append(to_save)
+        if first:
+            yield first, 1
+        if rest:
+            yield rest, concurrency
+
+
+def _match_subjects(members, results):
+    """
+    Maps each of the requested members to its value in a dict keyed by the Subjects in a response. Those come back
+    as new objects, so they're matched up by id, or by identifier for subjects that were looked up that way.
+    """
+    by_id, by_identifier = {}, {}
+    for subject, value in results.items():
+        by_id[subject.id] = value
+        if subject.identifier:
+            by_identifier[subject.identifier] = value
+    found = {}
+    for member in members:
+        key, index = (member.id, by_id) if member.id else (member.identifier, by_identifier)
+        if key in index:
+            found[member] = index[key]
+    return found
+
+
+def _lookup_key(obj):
+    # Lookups prefer the name over the uuid, as in Group.to_json and Stem.to_json
+    return ('name', obj.name) if obj.name else ('uuid', obj.uuid)
+
 class Grouper(object):
-    def __init__(self, base_url, session=None):
+    def __init__(self, base_url, session=None, *,
+                 pool_size=100,
+                 per_host_limit=0,
+                 keepalive_timeout=15,
+                 dns_cache_ttl=10,
+                 max_in_flight=None,
+                 limiter=None,
+                 rate_limit=None,
+                 rate_burst=None,
+                 member_batch_size=1000,
+                 member_concurrency=4,
+                 save_batch_size=100,
+                 save_concurrency=4,
+                 has_member_window=None,
+                 has_member_batch_size=100,
+                 subject_memberships_window=None,
+                 subject_memberships_batch_size=100,
+                 cache=None,
+                 single_flight=False,
+                 intern=False,
+                 retry_policy=None,
+                 circuit_breaker=None,
+                 timeout=None,
+                 hedge_policy=None,
+                 codec=None,
+                 observers=()):
         self._base_url = base_url
-        self._session = session or aiohttp.ClientSession()
+        # urljoin is slow enough to show up in per-request overhead, so the endpoint URLs are built once
+        self._api_url = urljoin(base_url, 'servicesRest/v2_2_000/')
+        # The pool options only apply to the session we create ourselves
+        self._session = session or aiohttp.ClientSession(connector=aiohttp.TCPConnector(
+            limit=pool_size,
+            limit_per_host=per_host_limit,
+            keepalive_timeout=keepalive_timeout,
+            use_dns_cache=bool(dns_cache_ttl),
+            ttl_dns_cache=dns_cache_ttl or None,
+        ))
+        # Bounds the requests in flight across all calls on this Grouper, so that naive fan-out queues here rather
+        # than exhausting sockets or overloading the WS.
+        # Pass an aiogrouper.AdaptiveConcurrencyLimiter as limiter to have the bound follow Grouper's latency.
+        self.limiter = limiter or (ConcurrencyLimiter(max_in_flight) if max_in_flight else None)
+        # Requests per second, on average, across all calls
+        self.rate_limiter = TokenBucket(rate_limit, rate_burst) if rate_limit else None
+        # Maximum number of subject lookups sent in one add/delete member request, and how many of those requests
+        # may be in flight at once for a single add_members/delete_members call.
+        self.member_batch_size = member_batch_size
+        self.member_concurrency = member_concurrency
+        # The same, for the groups and stems in a save_groups/save_stems call
+        self.save_batch_size = save_batch_size
+        self.save_concurrency = save_concurrency
+        # Opt-in: concurrent has_member calls against the same group within has_member_window seconds are sent
+        # as a single has_members request.
+        self.has_member_coalescer = None
+        if has_member_window is not None:
+            self.has_member_coalescer = Coalescer(self._has_member_batch,
+                                                  window=has_member_window,
+                                                  max_batch_size=has_member_batch_size)
+        # Likewise for get_subject_memberships calls that share the same filters, sent as one get_memberships.
+        self.subject_memberships_coalescer = None
+        if subject_memberships_window is not None:
+            self.subject_memberships_coalescer = Coalescer(self._subject_memberships_batch,
+                                                           window=subject_memberships_window,
+                                                           max_batch_size=subject_memberships_batch_size)
+        # An optional aiogrouper.Cache for find_groups, find_stems and get_members, invalidated by our own writes.
+        self.cache = cache
+        # Opt-in: concurrent identical reads (same method, path and body) share one request and its parsed result.
+        # Unlike the cache, nothing is kept once the request completes.
+        self.single_flight = SingleFlight() if single_flight else None
+        # With intern=True, each subject, group and stem is materialised once for as long as something refers to it,
+        # however many responses it appears in.
+        self.identity_map = weakref.WeakValueDictionary() if intern else None
+        # StemTrees to keep up to date as stems are saved and deleted
+        self.stem_trees = weakref.WeakSet()
+        # An aiogrouper.RetryPolicy and aiogrouper.CircuitBreaker; without them each request gets a single attempt.
+        self.retry_policy = retry_policy
+        self.circuit_breaker = circuit_breaker
+        # The default deadline in seconds for each call, covering queueing, retries, and reading the response
+        self.timeout = timeout
+        # An aiogrouper.HedgePolicy; with one, slow idempotent reads get a second request sent alongside them
+        self.hedge_policy = hedge_policy
+        # Serializes request bodies and parses responses; a codec name, an instance, or the fastest available.
+        self.codec = codec if hasattr(codec, 'loads') else get_codec(codec)
+        # aiogrouper.Observers (e.g. a HistogramCollector) told about every request attempt
+        self.observers = list(observers)
 
     def close(self):
-        self._session.close()
+        # aiohttp's ClientSession.close() is a coroutine from aiohttp 3, which the caller then needs to await
+        return self._session.close()
 
     @property
     def api_url(self):
-        return urljoin(self._base_url, 'servicesRest/v2_2_000/')
+        return self._api_url
 
     @property
     def stems_url(self):
-        return urljoin(self.api_url, 'stems')
+        return self._api_url + 'stems'
 
     @property
     def groups_url(self):
-        return urljoin(self.api_url, 'groups')
+        return self._api_url + 'groups'
 
     @property
     def group_members_url(self):
-        return urljoin(self.api_url, 'groups/{}/members')
+        return self._api_url + 'groups/{}/members'
 
     @property
     def memberships_url(self):
-        return urljoin(self.api_url, 'memberships')
+        return self._api_url + 'memberships'
 
     @property
     def privileges_url(self):
-        return urljoin(self.api_url, 'grouperPrivileges')
+        return self._api_url + 'grouperPrivileges'
 
-    @asyncio.coroutine
-    def request(self, method, path, data):
-        headers = {'Content-Type': 'text/x-json'}
-        url = urljoin(self._base_url, path)
+    def _url(self, path):
+        # Paths are almost always one of the URLs above already
+        return path if path.startswith(self._api_url) else urljoin(self._base_url, path)
+
+    async def request(self, method, path, data, *, idempotent=None, parse=None, timeout=None):
+        """
+        Sends a request to the Grouper WS and returns the parsed response.
+
+        :param idempotent: Whether the request may be retried under the retry policy. By default, reads and saves in
+            INSERT_OR_UPDATE or UPDATE mode are considered idempotent.
+        :param parse: Called with the decoded response in place of parse_response
+        :param timeout: Seconds before giving up with a GrouperTimeoutException; defaults to the Grouper's timeout
+        """
         if hasattr(data, 'to_json'):
             data = data.to_json()
+        url = self._url(path)
+        timeout = self.timeout if timeout is None else timeout
+        if self.single_flight is not None and parse is None and \
+                (not data or isinstance(data, dict) and next(iter(data)) in READ_REQUESTS):
+            key = method, path, json.dumps(data, sort_keys=True, separators=(',', ':')) if data else None
+            # The shared request runs to completion even if this caller's deadline passes first
+            coro = self.single_flight.do(key, lambda: self._request(method, path, url, data,
+                                                                    idempotent=idempotent, timeout=timeout))
+            return await self._with_deadline(coro, timeout, method, url)
+        return await self._request(method, path, url, data, idempotent=idempotent, parse=parse, timeout=timeout)
+
+    async def _with_deadline(self, coro, timeout, method, url):
+        if not timeout:
+            return await coro
+        try:
+            return await asyncio.wait_for(coro, timeout)
+        except asyncio.TimeoutError:
+            raise GrouperTimeoutException(timeout, method, url) from None
+
+    async def _request(self, method, path, url, data, *, idempotent=None, parse=None, timeout=None):
+        deadline = time.monotonic() + timeout if timeout else None
+        headers = {'Content-Type': 'text/x-json'}
+        if idempotent is None:
+            idempotent = is_idempotent(method, data)
         if isinstance(data, dict):
-            data = json.dumps(data)
-        start_time = time.time()
-        response = yield from self._session.request(method, url,
-                                                    data=data,
-                                                    headers=headers)
-        duration = int((time.time() - start_time) * 1000)
+            operation = next(iter(data))
+            data = self.codec.dumps(data)
+        else:
+            # Only get_members uses a bodyless GET
+            operation = 'WsRestGetMembersLiteRequest' if '/members' in path else method.upper()
+        attempt = 0
+        while True:
+            attempt += 1
+            event = RequestEvent(operation, method, url, attempt, len(data) if data else 0)
+            try:
+                if self.circuit_breaker:
+                    self.circuit_breaker.before_request()
+                start_time = time.monotonic()
+                try:
+                    hedge_delay = self.hedge_policy.delay(operation) if self.hedge_policy and idempotent else None
+                    if hedge_delay is None:
+                        send = self._send(method, url, data, headers, event)
+                    else:
+                        send = self._hedged_send(method, url, data, headers, event, hedge_delay)
+                    # The deadline is enforced per attempt so that a Grouper that never answers counts against the
+                    # circuit breaker and the limiter, as a timeout rather than a cancellation
+                    response_data = await (send if deadline is None else asyncio.wait_for(send, deadline - start_time))
+                except BaseException as e:
+                    if self.circuit_breaker:
+                        if isinstance(e, Exception):
+                            self.circuit_breaker.record_failure(e)
+                        else:
+                            self.circuit_breaker.record_cancelled()
+                    if isinstance(e, asyncio.TimeoutError) and deadline is not None and time.monotonic() >= deadline:
+                        if self.limiter:
+                            self.limiter.record(time.monotonic() - start_time, e)
+                        raise GrouperTimeoutException(timeout, method, url) from e
+                    raise
+                if self.circuit_breaker:
+                    self.circuit_breaker.record_success()
+                start_time = time.monotonic()
+                try:
+                    if parse:
+                        result = parse(response_data)
+                    else:
+                        result = self.parse_response(method, path, data, response_data)
+                finally:
+                    event.parse_time = time.monotonic() - start_time
+                    event.result_code = self._result_code(response_data)
+                event.object_count = len(result) if isinstance(result, collections.abc.Sized) else None
+            except Exception as e:
+                event.error = e
+                if self.observers:
+                    notify(self.observers, event)
+                if not (self.retry_policy and self.retry_policy.should_retry(e, attempt, idempotent)):
+                    raise
+                delay = self.retry_policy.delay(attempt)
+                if deadline is not None and time.monotonic() + delay >= deadline:
+                    raise
+                logger.warning("Grouper request failed, retrying in %.2fs (attempt %d of %d): %s %s %r",
+                               delay, attempt, self.retry_policy.max_attempts, method, url, e)
+                await asyncio.sleep(delay)
+            else:
+                if self.hedge_policy:
+                    self.hedge_policy.record(operation, event.network_time)
+                if self.observers:
+                    notify(self.observers, event)
+                return result
+
+    async def _hedged_send(self, method, url, data, headers, event, delay):
+        """
+        Like _send, but if no answer has arrived after `delay` seconds, sends a second copy of the request and uses
+        whichever answers first. The other is cancelled.
+        """
+        # Each copy has its own event, as the one that loses can still be finishing after we've returned
+        start_time = time.monotonic()
+        first_event = RequestEvent(event.operation, method, url, event.attempt, event.request_bytes)
+        first = asyncio.ensure_future(self._send(method, url, data, headers, first_event))
+        hedge, hedge_event, pending, winner = None, None, {first}, None
+        try:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if done:
+                winner = first
+                return first.result()
+            hedge_event = RequestEvent(event.operation, method, url, event.attempt, event.request_bytes)
+            hedge = asyncio.ensure_future(self._send(method, url, data, headers, hedge_event))
+            event.hedged = True
+            self.hedge_policy.hedges[event.operation] += 1
+            pending = {first, hedge}
+            while True:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # Prefer a success; only give up once both have failed
+                winner = next((f for f in done if not f.exception()), None)
+                if winner is not None or not pending:
+                    winner = winner or first
+                    break
+        finally:
+            for future in pending:
+                future.cancel()
+            for future in (first, hedge):
+                if future is not None and future.done() and not future.cancelled():
+                    future.exception()
+            event.queue_time = first_event.queue_time
+            if winner is hedge and hedge is not None:
+                event.status, event.response_bytes = hedge_event.status, hedge_event.response_bytes
+                event.network_time = hedge_event.network_time + delay
+            else:
+                event.status, event.response_bytes = first_event.status, first_event.response_bytes
+                event.network_time = (first_event.network_time if first.done() else
+                                      time.monotonic() - start_time - first_event.queue_time)
+        if winner is hedge:
+            self.hedge_policy.hedge_wins[event.operation] += 1
+            event.hedge_won = True
+        return winner.result()
+
+    @staticmethod
+    def _result_code(response_data):
+        try:
+            return next(iter(response_data.values()))['resultMetadata']['resultCode']
+        except (AttributeError, KeyError, StopIteration, TypeError):
+            return None
+
+    async def _open_stream(self, method, path, data):
+        """
+        Sends a request and returns (response, release) with the body unread, for incremental parsing.
+
+        The rate and in-flight limits and the circuit breaker apply, but failed requests aren't retried. The caller
+        must call release() once it's finished with the response, passing the MembershipStream that read it; the
+        observers are told about the request then, with the time spent parsing it.
+        """
+        url = self._url(path)
+        body = self.codec.dumps(data)
+        event = RequestEvent(next(iter(data)), method, url, 1, len(body))
+        start_time = time.monotonic()
+        if self.circuit_breaker:
+            self.circuit_breaker.before_request()
+        acquired = False
+        try:
+            # Waiting for the limiters is covered too, so that being cancelled meanwhile gives up a trial request
+            if self.rate_limiter:
+                await self.rate_limiter.acquire()
+            if self.limiter:
+                await self.limiter.acquire()
+                acquired = True
+            event.queue_time = time.monotonic() - start_time
+            start_time = time.monotonic()
+            response = await self._session.request(method, url,
+                                                   data=body,
+                                                   headers={'Content-Type': 'text/x-json'})
+            event.status = response.status
+            if response.status not in (http.client.OK, http.client.CREATED, http.client.INTERNAL_SERVER_ERROR):
+                try:
+                    raise GrouperHTTPException(response, await response.read())
+                finally:
+                    response.close()
+        except BaseException as e:
+            # Including cancellation, which would otherwise leave the in-flight slot taken for good
+            if self.circuit_breaker:
+                if isinstance(e, Exception):
+                    self.circuit_breaker.record_failure(e)
+                else:
+                    self.circuit_breaker.record_cancelled()
+            if acquired:
+                self.limiter.release()
+            if self.observers and isinstance(e, Exception):
+                event.error, event.network_time = e, time.monotonic() - start_time
+                notify(self.observers, event)
+            raise
+        if self.circuit_breaker:
+            self.circuit_breaker.record_success()
+
+        def release(stream=None):
+            response.close()
+            if self.limiter:
+                self.limiter.release()
+            if self.observers:
+                if stream is not None:
+                    event.response_bytes, event.parse_time, event.error = (stream.response_bytes, stream.parse_time,
+                                                                           stream.error)
+                    event.object_count = stream.parser.pair_count
+                    event.result_code = (stream.parser.result_metadata or {}).get('resultCode')
+                # Reading and parsing the body are interleaved; the parsing is counted separately
+                event.network_time = time.monotonic() - start_time - event.parse_time
+                notify(self.observers, event)
+
+        return response, release
+
+    async def _send(self, method, url, data, headers, event):
+        start_time = time.monotonic()
+        if self.rate_limiter:
+            await self.rate_limiter.acquire()
+        if self.limiter:
+            await self.limiter.acquire()
+        event.queue_time = time.monotonic() - start_time
+        start_time = time.monotonic()
+        try:
+            response_data = await self._exchange(method, url, data, headers, event)
+        except Exception as e:
+            if self.limiter:
+                self.limiter.record(time.monotonic() - start_time, e)
+            raise
+        else:
+            if self.limiter:
+                self.limiter.record(time.monotonic() - start_time)
+            return response_data
+        finally:
+            event.network_time = time.monotonic() - start_time
+            if self.limiter:
+                self.limiter.release()
+
+    async def _exchange(self, method, url, data, headers, event):
+        start_time = time.monotonic()
+        response = await self._session.request(method, url,
+                                               data=data,
+                                               headers=headers)
+        event.status = response.status
         try:
             if response.status not in (http.client.OK, http.client.CREATED, http.client.INTERNAL_SERVER_ERROR):
-                response_data = yield from response.read()
+                response_data = await response.read()
                 logger.error("Grouper exception: %s %s %s %s %s %s",
                              method, url, response.status, dict(response.headers), data, response_data)
                 raise GrouperHTTPException(response, response_data)
-            response_data = yield from response.json()
+            body = await response.read()
+            event.response_bytes = len(body)
+            response_data = self.codec.loads(body)
         finally:
             response.close()
-        logger.debug("Grouper request: %s %s %s %dms", method, url, response.status, duration,
-                     extra={'responseHeaders': dict(response.headers),
-                            'requestBody': data,
-                            'responseBody': response_data})
-        return self.parse_response(method, path, data, response_data)
+        if logger.isEnabledFor(logging.DEBUG):
+            duration = int((time.monotonic() - start_time) * 1000)
+            logger.debug("Grouper request: %s %s %s %dms", method, url, response.status, duration,
+                         extra={'responseHeaders': dict(response.headers),
+                                'requestBody': data,
+                                'responseBody': response_data})
+        return response_data
+
+    async def get(self, path, **kwargs):
+        return await self.request('get', path, None, **kwargs)
 
-    @asyncio.coroutine
-    def get(self, path):
-        return (yield from self.request('get', path, None))
+    async def post(self, path, data, **kwargs):
+        return await self.request('post', path, data, **kwargs)
 
-    @asyncio.coroutine
-    def post(self, path, data):
-        return (yield from self.request('post', path, data))
+    async def put(self, path, data, **kwargs):
+        return await self.request('put', path, data, **kwargs)
 
-    @asyncio.coroutine
-    def put(self, path, data):
-        return (yield from self.request('put', path, data))
+    def _from_json(self, cls, data):
+        obj = cls.from_json(data, grouper=self)
+        if self.identity_map is None:
+            return obj
+        if cls is Subject:
+            if data['id'] == 'None':
+                return obj
+            key = cls, data.get('sourceId'), data['id']
+        else:
+            key = cls, data.get('uuid') or data.get('name')
+        # The interned object is brought up to date with the response, unless its name or uuid has changed (e.g. a
+        # rename), in which case it's replaced, as it may be a key in a dict or set
+        interned = self.identity_map.get(key)
+        if interned is not None and interned._refresh(obj):
+            return interned
+        self.identity_map[key] = obj
+        return obj
 
     def parse_response(self, method, path, input, output, ignore_error=False):
         results_name, data = next(iter(output.items()))
@@ -102,144 +504,379 @@ class Grouper(object):
             raise exc(data['resultMetadata']['resultMessage'], method, path, input, output)
 
         if results_name == 'WsHasMemberResults':
-            results = {}
+            results = collections.OrderedDict()
             for result in data['results']:
-                results[Subject.from_json(result['wsSubject'])] = tf_to_bool(result['resultMetadata']['success'])
+                results[self._from_json(Subject, result['wsSubject'])] = tf_to_bool(result['resultMetadata']['success'])
             return results
         elif results_name == 'WsGetMembershipsResults':
-            groups = {g['uuid']: Group.from_json(g, grouper=self) for g in data.get('wsGroups', ())}
-            stems = {g['uuid']: Stem.from_json(g, grouper=self) for g in data.get('wsStems', ())}
-            subjects = {g['id']: Subject.from_json(g, grouper=self) for g in data.get('wsSubjects', ())}
             results = collections.defaultdict(set)
-            for membership in data.get('wsMemberships', ()):
-                if 'groupId' in membership:
-                    results[subjects[membership['subjectId']]].add(groups[membership['groupId']])
-                else:
-                    results[subjects[membership['subjectId']]].add(stems[membership['ownerStemId']])
+            parser = MembershipParser(self, method=method, path=path, input=input, incremental=False)
+            for subject, owner in parser.parse(output):
+                results[subject].add(owner)
             return dict(results)
         elif results_name == 'WsFindStemsResults':
-            return [Stem.from_json(r, grouper=self) for r in data['stemResults']]
+            return [self._from_json(Stem, r) for r in data['stemResults']]
         elif results_name == 'WsFindGroupsResults':
-            return [Group.from_json(r, grouper=self) for r in data.get('groupResults', ())]
-        elif results_name == 'WsGroupSaveResults':
-            return [Group.from_json(r['wsGroup'], grouper=self) for r in data['results']]
-        elif results_name == 'WsStemSaveResults':
-            return [Stem.from_json(r['wsStem'], grouper=self) for r in data['results']]
+            return [self._from_json(Group, r) for r in data.get('groupResults', ())]
+        elif results_name in ('WsGroupSaveResults', 'WsStemSaveResults'):
+            # (saved object or None, ResultCode) for each object sent, in order
+            cls, key = (Group, 'wsGroup') if results_name == 'WsGroupSaveResults' else (Stem, 'wsStem')
+            results = []
+            for result in data.get('results') or ():
+                result_code = ResultCode.inverse.get(result['resultMetadata']['resultCode'], ResultCode.exception)
+                if result_code.is_success and result.get(key):
+                    results.append((self._from_json(cls, result[key]), result_code))
+                else:
+                    results.append((None, result_code))
+            return results
         elif results_name == 'WsGetMembersLiteResult':
-            return [Subject.from_json(g, grouper=self) for g in data.get('wsSubjects', ())]
+            return [self._from_json(Subject, g) for g in data.get('wsSubjects', ())]
         elif results_name == 'WsGetGrouperPrivilegesLiteResult':
             results = collections.defaultdict(set)
             subjects = {}
             for privilege in data['privilegeResults']:
                 subject_key = (privilege['wsSubject']['sourceId'], privilege['wsSubject']['id'])
                 if subject_key not in subjects:
-                    subjects[subject_key] = Subject.from_json(privilege['wsSubject'], self)
+                    subjects[subject_key] = self._from_json(Subject, privilege['wsSubject'])
                 results[subjects[subject_key]].add(PrivilegeName[privilege['privilegeName']])
             return dict(results)
         elif results_name == 'WsAssignGrouperPrivilegesResults':
             return data
-        elif results_name == 'WsGroupDeleteResults':
-            pass # TODO
-        elif results_name == 'WsStemDeleteResults':
-            pass # TODO
+        elif results_name in ('WsGroupDeleteResults', 'WsStemDeleteResults'):
+            cls, key = (Group, 'wsGroup') if results_name == 'WsGroupDeleteResults' else (Stem, 'wsStem')
+            results = collections.OrderedDict()
+            for result in data.get('results', ()):
+                if result.get(key):
+                    results[self._from_json(cls, result[key])] = \
+                        ResultCode.inverse.get(result['resultMetadata']['resultCode'], ResultCode.exception)
+            return results
         elif results_name in ('WsAddMemberResults', 'WsDeleteMemberResults'):
             results = collections.OrderedDict()
             for result in data['results']:
-                results[Subject.from_json(result['wsSubject'])] = \
+                results[self._from_json(Subject, result['wsSubject'])] = \
                     ResultCode.inverse[result['resultMetadata']['resultCode']] if result['wsSubject']['id'] != 'None' else ResultCode.subject_not_found
             return results
         else:
             raise GrouperDeserializeException("Don't know how to deserialize response of type {}".format(results_name))
 
-    @asyncio.coroutine
-    def add_members(self, group, members, *, replace_existing=False):
+    async def _member_batch_request(self, group, members, request_name, **params):
+        url = self.group_members_url.format(group.name)
+        data = {
+            request_name: dict(params, subjectLookups=[member.to_json(lookup=True) for member in members]),
+        }
+        return await self.put(url, data)
+
+    async def _batched_member_requests(self, group, batches, request_name, concurrency, results=None, **params):
+        """
+        Sends every batch, adding each subject's ResultCode to `results`. If any batch fails, the others are still
+        sent, and a GrouperMembershipException with the results and the failed subjects is raised at the end.
+        """
+        concurrency = self.member_concurrency if concurrency is None else concurrency
+        results = collections.OrderedDict() if results is None else results
+        errors = collections.OrderedDict()
+
+        async def send(batch):
+            try:
+                batch_results = await self._member_batch_request(group, batch, request_name, **params)
+            except (GrouperException, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                errors.update((member, e) for member in batch)
+            else:
+                results.update(batch_results)
+
+        try:
+            await bounded_gather((send(batch) for batch in batches), concurrency)
+        finally:
+            self._invalidate_members()
+        if errors:
+            raise GrouperMembershipException(results, errors)
+        return results
+
+    async def add_members(self, group, members, *, replace_existing=False, batch_size=None, concurrency=None):
         members = list(members)
         if not members:
             if replace_existing:
-                yield from self.clear_members(group)
+                await self.clear_members(group)
             return collections.OrderedDict()
         assert isinstance(group, Group)
         assert all(isinstance(m, Subject) for m in members)
-        subject_lookups = [member.to_json(lookup=True) for member in members]
-        if not subject_lookups:
-            return collections.OrderedDict()
-        url = self.group_members_url.format(group.name)
-        data = {
-            'WsRestAddMemberRequest': {
-                'replaceAllExisting': bool_to_tf(replace_existing),
-                'subjectLookups': subject_lookups,
-            },
-        }
-        print(data)
-        return (yield from self.put(url, data))
+        batches = chunks(members, self.member_batch_size if batch_size is None else batch_size)
+        results = collections.OrderedDict()
+        if replace_existing:
+            # The replacing batch removes everything not in it, so it has to complete before we add the rest.
+            try:
+                results.update(await self._member_batch_request(group, batches.pop(0),
+                                                                'WsRestAddMemberRequest',
+                                                                replaceAllExisting='T'))
+            finally:
+                self._invalidate_members()
+        return await self._batched_member_requests(group, batches, 'WsRestAddMemberRequest', concurrency, results,
+                                                   replaceAllExisting='F')
 
-    @asyncio.coroutine
-    def delete_members(self, group, members):
+    async def delete_members(self, group, members, *, batch_size=None, concurrency=None):
         members = list(members)
         assert isinstance(group, Group)
         assert all(isinstance(m, Subject) for m in members)
-        subject_lookups = [member.to_json(lookup=True) for member in members]
-        if not subject_lookups:
+        if not members:
             return collections.OrderedDict()
-        url = self.group_members_url.format(group.name)
-        data = {
-            'WsRestDeleteMemberRequest': {
-                'subjectLookups': subject_lookups,
-            },
-        }
-        return (yield from self.put(url, data))
+        batches = chunks(members, self.member_batch_size if batch_size is None else batch_size)
+        return await self._batched_member_requests(group, batches, 'WsRestDeleteMemberRequest', concurrency)
+
+    async def set_members(self, group, members, *, batch_size=None, concurrency=None):
+        """
+        Makes the direct membership of a group match the given subjects, only sending the additions and removals.
+
+        Subjects with an id are compared against the current membership by id and source. Subjects looked up only by
+        identifier are always sent as additions, and Grouper's resolved id is used to stop them being removed again.
+
+        :return: A MembershipChanges summarising what was added, removed and left alone
+        """
+        assert isinstance(group, Group)
+        members = list(members)
+        assert all(isinstance(m, Subject) for m in members)
+        # Only direct memberships can be added or removed, so indirect ones mustn't count as already there
+        direct = await self._get_members(group, member_filter=MemberFilter.immediate)
+        current = {(s.source, s.id): s for s in direct}
+        current_ids = {s.id for s in current.values()}
+        wanted, to_add, unchanged = set(), [], []
+        for member in members:
+            if member.id and (member.source, member.id) in current or (not member.source and member.id in current_ids):
+                wanted.add(member.id)
+                unchanged.append(member)
+            else:
+                to_add.append(member)
 
-    @asyncio.coroutine
-    def set_members(self, group, members):
-        return (yield from self.add_members(group, members,
-                                            replace_existing=True))
+        added, not_found = [], []
+        add_results = await self.add_members(group, to_add, batch_size=batch_size, concurrency=concurrency)
+        for subject, result_code in add_results.items():
+            if result_code == ResultCode.subject_not_found:
+                not_found.append(subject)
+                continue
+            wanted.add(subject.id)
+            if result_code == ResultCode.success_already_existed:
+                unchanged.append(subject)
+            else:
+                added.append(subject)
 
-    @asyncio.coroutine
-    def get_members(self, group):
+        to_delete = [s for s in current.values() if s.id not in wanted]
+        await self.delete_members(group, to_delete, batch_size=batch_size, concurrency=concurrency)
+        return MembershipChanges(added=added, removed=to_delete, unchanged=unchanged, not_found=not_found)
+
+    async def clear_members(self, group, *, batch_size=None, concurrency=None):
         assert isinstance(group, Group)
-        return (yield from self.get(self.group_members_url.format(group.name)))
+        direct = await self._get_members(group, member_filter=MemberFilter.immediate)
+        return await self.delete_members(group, direct, batch_size=batch_size, concurrency=concurrency)
+
+    async def get_members(self, group, *, member_filter=None, timeout=None):
+        """
+        :param member_filter: A MemberFilter; by default Grouper's, which includes indirect members. Filtered calls
+            aren't cached.
+        """
+        assert isinstance(group, Group)
+        if self.cache is None or not self.cache.enabled('get_members') or member_filter is not None:
+            return await self._get_members(group, member_filter=member_filter, timeout=timeout)
+        members = self.cache.get('get_members', group.key)
+        if members is None:
+            generation = self.cache.generation('get_members')
+            members = await self._get_members(group, timeout=timeout)
+            self.cache.set('get_members', group.key, members, generation)
+        return list(members)
+
+    async def _get_members(self, group, *, member_filter=None, timeout=None):
+        url = self.group_members_url.format(group.name)
+        if member_filter is not None:
+            url = '{}?{}'.format(url, urlencode({'memberFilter': member_filter.value}))
+        return await self.get(url, timeout=timeout)
+
+    def iter_members(self, group, *, page_size=1000, prefetch=True, member_filter=None, sort_string='subjectId',
+                     ascending=True):
+        """
+        Iterates asynchronously over a group's members, fetching them a page at a time.
 
-    @asyncio.coroutine
-    def find_groups(self, *, groups=None, query=None):
+        :param page_size: The number of members to request at once
+        :param prefetch: If True, request the next page while the current one is being consumed
+        :param member_filter: A MemberFilter, as for get_members
+        :param sort_string: What to sort members by. Without a stable order, members can be repeated or skipped
+            between pages.
+        :return: A PageIterator of Subjects
+        """
+        assert isinstance(group, Group) and sort_string
+        params = {'memberFilter': member_filter.value} if member_filter is not None else {}
+        params.update(sortString=sort_string, ascending=bool_to_tf(ascending), pageSize=page_size)
+
+        async def fetch_page(page_number):
+            return await self.get('{}?{}'.format(self.group_members_url.format(group.name),
+                                                 urlencode(dict(params, pageNumber=page_number))))
+
+        return PageIterator(fetch_page, page_size, prefetch=prefetch)
+
+    async def _cached_query(self, operation, query_json, fetch):
+        key = ('query', json.dumps(query_json, sort_keys=True))
+        results = self.cache.get(operation, key)
+        if results is None:
+            generation = self.cache.generation(operation)
+            results = await fetch()
+            self.cache.set(operation, key, results, generation)
+        return list(results)
+
+    async def _cached_lookups(self, operation, lookups, fetch):
+        # Serve what we can from the cache, and fetch the rest in a single request
+        found, missing = {}, []
+        for lookup in lookups:
+            result = self.cache.get(operation, _lookup_key(lookup))
+            if result is None:
+                missing.append(lookup)
+            else:
+                found[_lookup_key(lookup)] = result
+        if missing:
+            generation = self.cache.generation(operation)
+            for result in await fetch(missing):
+                for key in (('name', result.name), ('uuid', result.uuid)):
+                    if key[1]:
+                        found[key] = result
+                        self.cache.set(operation, key, result, generation)
+        results, seen = [], set()
+        for lookup in lookups:
+            result = found.get(_lookup_key(lookup))
+            if result is not None and id(result) not in seen:
+                seen.add(id(result))
+                results.append(result)
+        return results
+
+    def _invalidate(self, operation, objs):
+        """
+        Drops the entries for objects by name and uuid, returning the objects that were cached for them.
+
+        A cached group or stem is stored under both its name and its uuid, so both are dropped even if the object
+        passed in only has one of them.
+        """
+        cached = []
+        if self.cache is None:
+            return cached
+        keys = [(kind, value) for obj in objs for kind, value in (('name', obj.name), ('uuid', obj.uuid)) if value]
+        while keys:
+            value = self.cache.invalidate(operation, keys.pop())
+            if isinstance(value, (Group, Stem)):
+                cached.append(value)
+                keys.extend((kind, v) for kind, v in (('name', value.name), ('uuid', value.uuid)) if v)
+        return cached
+
+    def _invalidate_groups(self, groups):
+        if self.cache is None:
+            return
+        groups = list(groups)
+        # get_members is cached by name or uuid, which a cached find_groups result may know when the caller doesn't
+        groups += self._invalidate('find_groups', groups)
+        self._invalidate('get_members', groups)
+        self.cache.invalidate_operation('find_groups', 'query')
+
+    def _invalidate_members(self):
+        # get_members is cached with Grouper's default filter, under which a group's members include those of the
+        # groups in it, so a change to one group's members can change what any other returns
+        if self.cache is not None:
+            self.cache.invalidate_operation('get_members')
+
+    def _invalidate_stems(self, stems, renamed=False):
+        if self.cache is None:
+            return
+        if renamed:
+            # Renaming a stem renames everything beneath it
+            self.cache.clear()
+            return
+        self._invalidate('find_stems', stems)
+        self.cache.invalidate_operation('find_stems', 'query')
+        self.cache.invalidate_operation('find_groups', 'query')
+
+    async def find_groups(self, *, groups=None, query=None, timeout=None):
         assert isinstance(query, Query) or all(isinstance(g, Group) for g in groups)
+        if self.cache is not None and self.cache.enabled('find_groups'):
+            if query:
+                return await self._cached_query('find_groups', query.to_json(),
+                                                lambda: self._find_groups(query=query, timeout=timeout))
+            elif groups:
+                return await self._cached_lookups('find_groups', groups,
+                                                  lambda missing: self._find_groups(groups=missing,
+                                                                                    timeout=timeout))
+        return await self._find_groups(groups=groups, query=query, timeout=timeout)
+
+    async def _find_groups(self, *, groups=None, query=None, timeout=None):
         data = {}
         if query:
             data['wsQueryFilter'] = query.to_json()
         elif groups:
             data['wsGroupLookups'] = [g.to_json(lookup=True) for g in groups]
         data = {'WsRestFindGroupsRequest': data}
-        return (yield from self.post(self.groups_url, data))
+        return await self.post(self.groups_url, data, timeout=timeout)
+
+    def iter_groups(self, query, *, page_size=1000, prefetch=True, sort_string='name', ascending=True):
+        """
+        Iterates asynchronously over the groups matching a query, fetching them a page at a time.
+
+        Pages are always fetched from the server, bypassing any cache.
+
+        :return: A PageIterator of Groups
+        """
+        assert isinstance(query, Query)
 
-    @asyncio.coroutine
-    def delete_groups(self, groups):
+        async def fetch_page(page_number):
+            return await self._find_groups(query=query.paged(page_size, page_number,
+                                                             sort_string=sort_string, ascending=ascending))
+
+        return PageIterator(fetch_page, page_size, prefetch=prefetch)
+
+    async def delete_groups(self, groups):
         if not groups:
             return {}
         assert all(isinstance(group, Group) for group in groups)
         data = {'WsRestGroupDeleteRequest': {
             'wsGroupLookups': [group.to_json(lookup=True) for group in groups]
         }}
+        results = {}
         try:
-            return (yield from self.post(self.groups_url, data))
+            results = await self.post(self.groups_url, data)
         except ProblemDeletingGroups as e:
-            return self.parse_response(e.method, e.path, e.input, e.output,
-                                       ignore_error=True)
+            results = self.parse_response(e.method, e.path, e.input, e.output,
+                                          ignore_error=True)
+        finally:
+            self._invalidate_groups(list(groups) + list(results))
+            self._invalidate_members()
+        return results
 
-    @asyncio.coroutine
-    def delete_stems(self, stems):
+    async def delete_stems(self, stems):
         if not stems:
             return {}
         assert all(isinstance(stem, Stem) for stem in stems)
         data = {'WsRestStemDeleteRequest': {
             'wsStemLookups': [stem.to_json(lookup=True) for stem in stems]
         }}
+        results = {}
         try:
-            return (yield from self.post(self.stems_url, data))
-        except ProblemDeletingStems as e:
-            return self.parse_response(e.method, e.path, e.input, e.output,
-                                       ignore_error=True)
+            try:
+                results = await self.post(self.stems_url, data)
+            except ProblemDeletingStems as e:
+                results = self.parse_response(e.method, e.path, e.input, e.output,
+                                              ignore_error=True)
+            for tree in self.stem_trees:
+                for stem, result_code in results.items():
+                    if result_code.is_success:
+                        tree._deleted(stem)
+            return results
+        finally:
+            self._invalidate_stems(list(stems) + list(results))
+
+    async def find_stems(self, *, lookups=None, query=None):
+        if self.cache is not None and self.cache.enabled('find_stems'):
+            if lookups:
+                assert all(isinstance(l, Stem) for l in lookups)
+                assert query is None
+                return await self._cached_lookups('find_stems', lookups,
+                                                  lambda missing: self._find_stems(lookups=missing))
+            elif lookups is None and query is not None:
+                assert isinstance(query, Query)
+                return await self._cached_query('find_stems', query.to_json(stem_query=True),
+                                                lambda: self._find_stems(query=query))
+        return await self._find_stems(lookups=lookups, query=query)
 
-    @asyncio.coroutine
-    def find_stems(self, *, lookups=None, query=None):
+    async def _find_stems(self, *, lookups=None, query=None):
         data = {}
         if lookups is not None:
             assert all(isinstance(l, Stem) for l in lookups)
@@ -253,26 +890,38 @@ class Grouper(object):
         else:
             raise AssertionError("Must provide either lookups or query")
         data = {'WsRestFindStemsRequest': data}
-        return (yield from self.post(self.stems_url, data))
+        return await self.post(self.stems_url, data)
+
+    async def load_stem_tree(self, root, *, concurrency=4):
+        """
+        Loads the stems beneath root into a StemTree, which is kept up to date with this Grouper's stem saves and
+        deletes.
+        """
+        return await StemTree(self, root, concurrency=concurrency).load()
+
+    def iter_stems(self, query, *, page_size=1000, prefetch=True, sort_string='name', ascending=True):
+        """
+        Iterates asynchronously over the stems matching a query, fetching them a page at a time.
+
+        :return: A PageIterator of Stems
+        """
+        assert isinstance(query, Query)
 
-    @asyncio.coroutine
-    def lookup_groups(self, groups):
+        async def fetch_page(page_number):
+            return await self._find_stems(query=query.paged(page_size, page_number,
+                                                            sort_string=sort_string, ascending=ascending))
+
+        return PageIterator(fetch_page, page_size, prefetch=prefetch)
+
+    async def lookup_groups(self, groups):
         data = {
             'WsRestFindGroupsRequest': {
                 'wsGroupLookups': query.to_json(),
             },
         }
-        return (yield from self.post(self.groups_url, data))
-
-    @asyncio.coroutine
-    def get_memberships(self, members, *,
-                        groups=None,
-                        subject_attribute_names=(),
-                        stem=None,
-                        stem_scope=StemScope.all_in_subtree,
-                        field_type=None):
-        if groups is not None and len(groups) == 0:
-            return {member: set() for member in members}
+        return await self.post(self.groups_url, data)
+
+    def _memberships_request(self, members, *, groups, subject_attribute_names, stem, stem_scope, field_type):
         assert all(isinstance(member, Subject) for member in members)
         data = {
             'WsRestGetMembershipsRequest': {
@@ -293,29 +942,146 @@ class Grouper(object):
         if field_type is not None:
             assert isinstance(field_type, FieldType)
             data['WsRestGetMembershipsRequest']['fieldType'] = field_type.value
+        return data
+
+    async def get_memberships(self, members, *,
+                              groups=None,
+                              subject_attribute_names=(),
+                              stem=None,
+                              stem_scope=StemScope.all_in_subtree,
+                              field_type=None,
+                              streaming=False,
+                              timeout=None):
+        """
+        Returns a dict mapping each subject to the set of groups and stems it is a member of.
+
+        :param streaming: If True, resolve memberships while the response is still being read (incrementally, if
+            ijson is installed), which keeps peak memory down for large responses. Streamed requests aren't retried.
+        """
+        if groups is not None and len(groups) == 0:
+            return {member: set() for member in members}
+        if streaming:
+            stream = self.iter_memberships(members,
+                                           groups=groups,
+                                           subject_attribute_names=subject_attribute_names,
+                                           stem=stem,
+                                           stem_scope=stem_scope,
+                                           field_type=field_type)
+            # The deadline covers reading the whole response, as it does for other calls
+            return await self._with_deadline(stream.collect(), self.timeout if timeout is None else timeout,
+                                             'post', self.memberships_url)
+        data = self._memberships_request(members,
+                                         groups=groups,
+                                         subject_attribute_names=subject_attribute_names,
+                                         stem=stem,
+                                         stem_scope=stem_scope,
+                                         field_type=field_type)
+        return await self.post(self.memberships_url, data, timeout=timeout)
+
+    async def get_membership_matrix(self, members, *,
+                                    groups=None,
+                                    subject_attribute_names=(),
+                                    stem=None,
+                                    stem_scope=StemScope.all_in_subtree,
+                                    field_type=None,
+                                    streaming=False,
+                                    timeout=None):
+        """
+        Like get_memberships, but returns a MembershipMatrix of subject and owner indexes rather than a dict of sets.
+        Every requested subject appears in the matrix's subject table, in order, whether or not it has memberships.
+        """
+        members = list(members)
+        filters = dict(groups=groups,
+                       subject_attribute_names=subject_attribute_names,
+                       stem=stem,
+                       stem_scope=stem_scope,
+                       field_type=field_type)
+        if groups is not None and len(groups) == 0:
+            return MembershipMatrix.from_pairs((), subjects=members)
+        if streaming:
+            stream = self.iter_memberships(members, **filters)
+
+            async def collect():
+                matrix = MembershipMatrix.from_pairs((), subjects=members)
+                async for subject, owner in stream:
+                    matrix.add(subject, owner)
+                return matrix
 
-        return (yield from self.post(self.memberships_url, data))
-
-    @asyncio.coroutine
-    def get_subject_memberships(self, member, *,
-                                groups=None,
-                                subject_attribute_names=(),
-                                stem=None,
-                                stem_scope=StemScope.all_in_subtree,
-                                field_type=None):
-        results = yield from self.get_memberships([member],
-                                                  groups=groups,
-                                                  subject_attribute_names=subject_attribute_names,
-                                                  stem=stem,
-                                                  stem_scope=stem_scope,
-                                                  field_type=field_type)
+            return await self._with_deadline(collect(), self.timeout if timeout is None else timeout,
+                                             'post', self.memberships_url)
+        data = self._memberships_request(members, **filters)
+
+        def parse(output):
+            parser = MembershipParser(self, path=self.memberships_url, input=data, incremental=False)
+            return MembershipMatrix.from_pairs(parser.parse(output), subjects=members)
+
+        return await self.post(self.memberships_url, data, parse=parse, timeout=timeout)
+
+    def iter_memberships(self, members, *,
+                         groups=None,
+                         subject_attribute_names=(),
+                         stem=None,
+                         stem_scope=StemScope.all_in_subtree,
+                         field_type=None,
+                         chunk_size=65536):
+        """
+        Iterates asynchronously over (subject, owner) membership pairs as the response arrives, where owner is a
+        Group or a Stem. Takes the same filters as get_memberships.
+
+        :return: A MembershipStream
+        """
+        members = list(members)
+        data = self._memberships_request(members,
+                                         groups=groups,
+                                         subject_attribute_names=subject_attribute_names,
+                                         stem=stem,
+                                         stem_scope=stem_scope,
+                                         field_type=field_type)
+        parser = MembershipParser(self, path=self.memberships_url, input=data)
+        if groups is not None and len(groups) == 0:
+            return MembershipStream(parser, None)
+        return MembershipStream(parser, lambda: self._open_stream('post', self.memberships_url, data),
+                                chunk_size=chunk_size)
+
+    async def get_subject_memberships(self, member, *,
+                                      groups=None,
+                                      subject_attribute_names=(),
+                                      stem=None,
+                                      stem_scope=StemScope.all_in_subtree,
+                                      field_type=None):
+        if self.subject_memberships_coalescer:
+            assert isinstance(member, Subject)
+            assert stem is None or isinstance(stem, Stem)
+            key = (tuple(groups) if groups is not None else None,
+                   (stem.name, stem.uuid) if stem is not None else None,
+                   stem_scope, field_type, tuple(subject_attribute_names))
+            return await self.subject_memberships_coalescer.submit(key, member)
+        results = await self.get_memberships([member],
+                                             groups=groups,
+                                             subject_attribute_names=subject_attribute_names,
+                                             stem=stem,
+                                             stem_scope=stem_scope,
+                                             field_type=field_type)
         try:
             return results.popitem()[1]
         except KeyError:
             return set()
 
-    @asyncio.coroutine
-    def has_members(self, group, members):
+    async def _subject_memberships_batch(self, key, members):
+        groups, stem, stem_scope, field_type, subject_attribute_names = key
+        if stem is not None:
+            stem = Stem(self, name=stem[0], uuid=stem[1])
+        results = await self.get_memberships(members,
+                                             groups=list(groups) if groups is not None else None,
+                                             subject_attribute_names=subject_attribute_names,
+                                             stem=stem,
+                                             stem_scope=stem_scope,
+                                             field_type=field_type)
+        # Subjects without memberships are missing from the response
+        found = _match_subjects(members, results)
+        return {member: found.get(member, set()) for member in members}
+
+    async def has_members(self, group, members, *, timeout=None):
         assert isinstance(group, Group)
         assert all(isinstance(member, Subject) for member in members)
         data = {
@@ -323,60 +1089,141 @@ class Grouper(object):
                 'subjectLookups': [m.to_json(lookup=True) for m in members],
             }
         }
-        return (yield from self.post(self.group_members_url.format(group.name), data))
+        return await self.post(self.group_members_url.format(group.name), data, timeout=timeout)
 
-    @asyncio.coroutine
-    def has_member(self, group, member):
-        results = yield from self.has_members(group, [member])
+    async def has_member(self, group, member, *, timeout=None):
+        if self.has_member_coalescer:
+            assert isinstance(group, Group)
+            assert isinstance(member, Subject)
+            # The batch's own request runs under the default timeout; this bounds how long this caller waits for it
+            timeout = self.timeout if timeout is None else timeout
+            return await self._with_deadline(self.has_member_coalescer.submit(group, member), timeout,
+                                             'post', self.group_members_url.format(group.name))
+        results = await self.has_members(group, [member], timeout=timeout)
         return results.popitem()[1]
 
-    @asyncio.coroutine
-    def save_groups(self, group_to_saves, save_mode=SaveMode.insert_or_update):
+    async def _has_member_batch(self, group, members):
+        return _match_subjects(members, await self.has_members(group, members))
+
+    async def _save(self, url, request_name, to_saves, *, saving, problem_exception, nested, batch_size, concurrency):
+        """
+        Sends saves in chunks, recording each object's outcome in a SaveResult rather than failing the whole call.
+
+        :param saving: Returns the Group or Stem a GroupToSave or StemToSave saves
+        :param nested: Whether objects may be parents of others in the same call, as stems can
+        """
+        batch_size = self.save_batch_size if batch_size is None else batch_size
+        concurrency = self.save_concurrency if concurrency is None else concurrency
+        result = SaveResult(to_saves)
+        to_saves_name = 'wsGroupToSaves' if request_name == 'WsRestGroupSaveRequest' else 'wsStemToSaves'
+
+        async def save_batch(batch):
+            data = {request_name: {to_saves_name: [s.to_json() for s in batch]}}
+            error = None
+            try:
+                saved = await self.put(url, data)
+            except problem_exception as e:
+                # Some objects failed; the others were still saved
+                saved, error = self.parse_response(e.method, e.path, e.input, e.output, ignore_error=True), e
+            except (GrouperException, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                saved, error = (), e
+            if len(saved) != len(batch):
+                error = error or GrouperDeserializeException("Expected {} save results, got {}".format(len(batch),
+                                                                                                      len(saved)))
+                for to_save in batch:
+                    result._record(to_save, ResultCode.exception, error=error)
+                return
+            # Results come back in the order they were sent, which is the only reliable way to match them up when
+            # an object is being renamed.
+            for to_save, (obj, result_code) in zip(batch, saved):
+                if result_code.is_success:
+                    if obj is None:
+                        obj = saving(to_save)
+                    elif saving(to_save).name and not saving(to_save).uuid:
+                        # Only the uuid is filled in, as the name is what the object is hashed by, and it may
+                        # already be a key in a dict or set
+                        saving(to_save)._uuid = obj.uuid
+                    result._record(to_save, result_code, saved=obj)
+                else:
+                    result._record(to_save, result_code, error=error)
+
+        for phase, phase_concurrency in _save_phases(to_saves, saving, nested, concurrency):
+            await bounded_gather((save_batch(batch) for batch in chunks(phase, batch_size)), phase_concurrency)
+        return result._finish()
+
+    async def save_groups(self, group_to_saves, save_mode=SaveMode.insert_or_update, *, batch_size=None, concurrency=None,
+                          raise_on_error=True):
+        """
+        Saves groups in concurrent batches. A failure only affects the groups it concerns.
+
+        :param raise_on_error: If True, raise a GrouperSaveException (holding the SaveResult) once every batch is done
+            if any group couldn't be saved. If False, check the SaveResult's `failed` instead.
+        :return: A SaveResult, which is a list of the groups saved; with raise_on_error, that's all of them, in order
+        """
         assert all(isinstance(g, (Group, GroupToSave)) for g in group_to_saves)
         group_to_saves = [g if isinstance(g, GroupToSave) else GroupToSave(g, save_mode=save_mode)
                           for g in group_to_saves]
-        data = {'WsRestGroupSaveRequest': {
-            'wsGroupToSaves': [g.to_json() for g in group_to_saves],
-        }}
-        groups = (yield from self.put(self.groups_url, data))
-        group_map = {g.name: g for g in groups}
-        for group_to_save in group_to_saves:
-            if group_to_save.group_lookup.name in group_map:
-                group_to_save.group.uuid = group_map[group_to_save.group_lookup.name].uuid
-                group_to_save.group.name = group_map[group_to_save.group_lookup.name].name
-        return groups
-
-    @asyncio.coroutine
-    def save_group(self, group):
-        return (yield from self.save_groups([group]))[0]
-
-    @asyncio.coroutine
-    def save_stems(self, stem_to_saves, save_mode=SaveMode.insert_or_update):
+        result = ()
+        try:
+            result = await self._save(self.groups_url, 'WsRestGroupSaveRequest', group_to_saves,
+                                      saving=lambda g: g.group,
+                                      problem_exception=ProblemSavingGroups,
+                                      nested=False,
+                                      batch_size=batch_size,
+                                      concurrency=concurrency)
+        finally:
+            self._invalidate_groups([g.group_lookup for g in group_to_saves] + [g.group for g in group_to_saves] +
+                                    list(result))
+        if raise_on_error and result.failed:
+            raise GrouperSaveException(result)
+        return result
+
+    async def save_group(self, group):
+        result = await self.save_groups([group], raise_on_error=False)
+        if result.failed:
+            raise next(iter(result.errors.values()), None) or GrouperSaveException(result)
+        return result[0]
+
+    async def save_stems(self, stem_to_saves, save_mode=SaveMode.insert_or_update, *, batch_size=None, concurrency=None,
+                         raise_on_error=True):
+        """
+        Saves stems in concurrent batches, a level at a time so that parents are saved before their children. A
+        failure only affects the stems it concerns.
+
+        :param raise_on_error: As for save_groups
+        :return: A SaveResult, which is a list of the stems saved
+        """
         assert all(isinstance(s, (Stem, StemToSave)) for s in stem_to_saves)
         stem_to_saves = [s if isinstance(s, StemToSave) else StemToSave(s, save_mode=save_mode)
                          for s in stem_to_saves]
-        data = {'WsRestStemSaveRequest': {
-            'wsStemToSaves': [s.to_json()
-                              if isinstance(s, StemToSave) else
-                              StemToSave(s, save_mode=save_mode).to_json()
-                              for s in stem_to_saves]
-        }}
-        stems = (yield from self.put(self.stems_url, data))
-        stem_map = {s.name: s for s in stems}
-        for stem_to_save in stem_to_saves:
-            if stem_to_save.stem_lookup.name in stem_map:
-                stem_to_save.stem.uuid = stem_map[stem_to_save.stem_lookup.name].uuid
-                stem_to_save.stem.name = stem_map[stem_to_save.stem_lookup.name].name
-        return stems
-
-    @asyncio.coroutine
-    def save_stem(self, stem):
-        return (yield from self.save_stems([stem]))[0]
-
-    @asyncio.coroutine
-    def assign_privileges(self, privilege_names, allowed=True,
-                          stem=None, group=None, members=(),
-                          replace_existing=False):
+        result = ()
+        try:
+            result = await self._save(self.stems_url, 'WsRestStemSaveRequest', stem_to_saves,
+                                      saving=lambda s: s.stem,
+                                      problem_exception=ProblemSavingStems,
+                                      nested=True,
+                                      batch_size=batch_size,
+                                      concurrency=concurrency)
+            for tree in self.stem_trees:
+                for stem_to_save, stem in zip(result.succeeded, result):
+                    tree._saved(stem_to_save.stem_lookup.name, stem)
+        finally:
+            self._invalidate_stems([s.stem_lookup for s in stem_to_saves] + [s.stem for s in stem_to_saves] +
+                                   list(result),
+                                   renamed=any(s.stem_lookup.name != s.stem.name for s in stem_to_saves))
+        if raise_on_error and result.failed:
+            raise GrouperSaveException(result)
+        return result
+
+    async def save_stem(self, stem):
+        result = await self.save_stems([stem], raise_on_error=False)
+        if result.failed:
+            raise next(iter(result.errors.values()), None) or GrouperSaveException(result)
+        return result[0]
+
+    async def assign_privileges(self, privilege_names, allowed=True,
+                                stem=None, group=None, members=(),
+                                replace_existing=False):
         assert all(isinstance(pn, PrivilegeName) for pn in privilege_names)
         data = {
             'allowed': bool_to_tf(allowed),
@@ -391,13 +1238,13 @@ class Grouper(object):
             data['wsGroupLookup'] = group.to_json(lookup=True)
 
         data = {'WsRestAssignGrouperPrivilegesRequest': data}
-        return (yield from self.post(self.privileges_url, data))
+        return await self.post(self.privileges_url, data)
 
-    def get_privileges(self, *,
-                       stem=None, group=None, subject=None,
-                       privilege_name=None,
-                       include_group_detail=False,
-                       include_subject_detail=False):
+    async def get_privileges(self, *,
+                             stem=None, group=None, subject=None,
+                             privilege_name=None,
+                             include_group_detail=False,
+                             include_subject_detail=False):
         assert isinstance(stem, Stem) or isinstance(group, Group)
         assert subject is None or isinstance(subject, Subject)
         assert privilege_name is None or isinstance(privilege_name, PrivilegeName)
@@ -412,18 +1259,58 @@ class Grouper(object):
         if subject and subject.identifier: data['subjectIdentifier'] = subject.identifier
         if subject and subject.source: data['subjectSourceId'] = subject.source
         data = {'WsRestGetGrouperPrivilegesLiteRequest': data}
-        result = (yield from self.post(self.privileges_url, data))
+        result = await self.post(self.privileges_url, data)
         if subject:
             return result.popitem()[1] if result else set()
         else:
             return result
 
-    @asyncio.coroutine
-    def recursive_delete(self, stem, include_sub_stems=True, include_base_stem=False):
-        groups = yield from self.find_groups(query=FindByStemName(stem.name, recursive=True))
-        results = yield from self.delete_groups(groups)
+    async def recursive_delete(self, stem, include_sub_stems=True, include_base_stem=False, *,
+                               batch_size=100, concurrency=4, progress=None):
+        """
+        Deletes every group beneath a stem and, optionally, its sub-stems and the stem itself.
+
+        Groups are deleted in concurrent batches. Stems are then deleted a level at a time, deepest first, so that no
+        stem still has children when it's deleted.
+
+        :param progress: Called as progress(kind, done, total) after each batch, where kind is 'groups' or 'stems'
+        :return: A RecursiveDeleteResult with a ResultCode for each group and stem
+        """
+        assert isinstance(stem, Stem)
+        result = RecursiveDeleteResult()
+        group_query = FindByStemName(stem.name, recursive=True)
+        if include_sub_stems:
+            groups, stems = await asyncio.gather(
+                self._find_groups(query=group_query),
+                self._find_stems(query=FindByParentStemName(stem.name, recursive=True)))
+            stems = [s for s in stems if s.name != stem.name]
+        else:
+            groups, stems = await self._find_groups(query=group_query), []
+
+        async def delete_batch(kind, batch, delete, total):
+            try:
+                results = await delete(batch)
+            except (GrouperException, aiohttp.ClientError, asyncio.TimeoutError) as e:
+                # The rest of the batches carry on, so that as much is deleted as can be
+                results = collections.OrderedDict((obj, ResultCode.exception) for obj in batch)
+                result.errors.update((obj, e) for obj in batch)
+            getattr(result, kind).update(results)
+            if progress:
+                progress(kind, len(getattr(result, kind)), total)
+
+        async def delete_batches(kind, objs, delete, total):
+            await bounded_gather((delete_batch(kind, batch, delete, total) for batch in chunks(objs, batch_size)),
+                                 concurrency)
+
+        if groups:
+            await delete_batches('groups', groups, self.delete_groups, len(groups))
+
         if include_sub_stems:
-            stems = yield from self.find_stems(query=FindByParentStemName(stem.name))
             if include_base_stem:
                 stems.append(stem)
-            yield from self.delete_stems(stems)
+            levels = collections.defaultdict(list)
+            for sub_stem in stems:
+                levels[sub_stem.name.count(':')].append(sub_stem)
+            for depth in sorted(levels, reverse=True):
+                await delete_batches('stems', levels[depth], self.delete_stems, len(stems))
+        return result
@@ -0,0 +1,59 @@
+import collections
+
+__all__ = ['HedgePolicy']
+
+# Idempotent reads whose latency matters most to callers
+HEDGED_REQUESTS = frozenset([
+    'WsRestFindGroupsRequest',
+    'WsRestGetMembersLiteRequest',
+    'WsRestGetMembershipsRequest',
+    'WsRestHasMemberRequest',
+])
+
+
+class HedgePolicy(object):
+    """
+    Decides when to send a second, hedging copy of a slow read.
+
+    Recent latencies are kept per operation. Once `min_samples` have been seen, an attempt that hasn't answered
+    within the `percentile` latency (but at least `min_delay` seconds) gets a second request sent alongside it, and
+    whichever answers first is used. Hedging at the 95th percentile costs around 5% more requests.
+    """
+    def __init__(self, *, percentile=95, min_delay=0.005, window=1000, min_samples=20, operations=HEDGED_REQUESTS):
+        assert 0 < percentile < 100
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.window = window
+        self.min_samples = min_samples
+        self.operations = frozenset(operations)
+        self._latencies = collections.defaultdict(lambda: collections.deque(maxlen=window))
+        self._delays = {}
+        # Samples recorded per operation since its delay was last worked out
+        self._since_update = collections.Counter()
+        self.hedges = collections.Counter()
+        self.hedge_wins = collections.Counter()
+
+    def record(self, operation, latency):
+        latencies = self._latencies[operation]
+        latencies.append(latency)
+        self._since_update[operation] += 1
+        # Re-sorting the window on every request would cost more than it's worth
+        if len(latencies) >= self.min_samples and (operation not in self._delays or
+                                                   self._since_update[operation] >= max(self.min_samples, 50)):
+            self._since_update[operation] = 0
+            ordered = sorted(latencies)
+            self._delays[operation] = max(self.min_delay,
+                                          ordered[min(len(ordered) - 1, len(ordered) * self.percentile // 100)])
+
+    def delay(self, operation):
+        """
+        How long to wait before hedging a request, or None if it shouldn't be hedged (yet).
+        """
+        if operation not in self.operations:
+            return None
+        return self._delays.get(operation)
+
+    def __str__(self):
+        return '<HedgePolicy p{} {} hedges, {} won>'.format(self.percentile, sum(self.hedges.values()),
+                                                            sum(self.hedge_wins.values()))
+    __repr__ = __str__
@@ -0,0 +1,171 @@
+import asyncio
+import collections
+import time
+
+from .retry import is_transient
+
+__all__ = ['ConcurrencyLimiter', 'AdaptiveConcurrencyLimiter', 'TokenBucket']
+
+
+class ConcurrencyLimiter(object):
+    """
+    Bounds the number of requests in flight, queueing the rest in arrival order.
+
+    Unlike an asyncio.Semaphore, the limit can be changed while in use. Time spent waiting for a slot is recorded.
+    """
+    def __init__(self, limit):
+        assert limit >= 1
+        self._limit = limit
+        self._waiters = collections.deque()
+        self.in_flight = 0
+        self.acquisitions = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    @property
+    def limit(self):
+        return self._limit
+
+    @limit.setter
+    def limit(self, value):
+        assert value >= 1
+        self._limit = value
+        self._wake()
+
+    @property
+    def waiting(self):
+        return sum(1 for waiter in self._waiters if not waiter.done())
+
+    @property
+    def mean_wait(self):
+        return self.total_wait / self.acquisitions if self.acquisitions else 0.0
+
+    async def acquire(self):
+        """
+        Waits for a slot, and returns how long that took in seconds.
+        """
+        start = time.monotonic()
+        if self.in_flight < self._limit and not self._waiters:
+            self.in_flight += 1
+        else:
+            waiter = asyncio.get_event_loop().create_future()
+            self._waiters.append(waiter)
+            try:
+                await waiter
+            except asyncio.CancelledError:
+                if not waiter.cancelled():
+                    # We were handed a slot just as we were cancelled
+                    self.release()
+                raise
+        wait = time.monotonic() - start
+        self.acquisitions += 1
+        self.total_wait += wait
+        self.max_wait = max(self.max_wait, wait)
+        return wait
+
+    def release(self):
+        self.in_flight -= 1
+        self._wake()
+
+    def record(self, latency, exc=None):
+        """
+        Called with the outcome of each request sent under this limiter.
+        """
+        pass
+
+    def _wake(self):
+        while self._waiters and self.in_flight < self._limit:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                self.in_flight += 1
+                waiter.set_result(None)
+
+    @property
+    def stats(self):
+        return {'limit': self._limit, 'in_flight': self.in_flight, 'waiting': self.waiting,
+                'acquisitions': self.acquisitions, 'mean_wait': self.mean_wait, 'max_wait': self.max_wait}
+
+    def __str__(self):
+        return '<ConcurrencyLimiter {}/{} in flight, {} waiting>'.format(self.in_flight, self._limit, self.waiting)
+    __repr__ = __str__
+
+
+class AdaptiveConcurrencyLimiter(ConcurrencyLimiter):
+    """
+    A ConcurrencyLimiter that tunes its own limit using additive-increase/multiplicative-decrease.
+
+    Each request that completes within `target_latency` seconds grows the limit by about one per limit's worth of
+    requests. A timeout, connection error, 5xx response or a latency over `spike_factor` times the target cuts it by
+    `decrease_factor`, at most once per `target_latency` so that one slow spell doesn't collapse it to the minimum.
+    """
+    def __init__(self, *, initial_limit=10, min_limit=1, max_limit=200, target_latency=1.0,
+                 spike_factor=2.0, decrease_factor=0.7):
+        assert 1 <= min_limit <= initial_limit <= max_limit
+        super().__init__(initial_limit)
+        self.min_limit, self.max_limit = min_limit, max_limit
+        self.target_latency = target_latency
+        self.spike_factor = spike_factor
+        self.decrease_factor = decrease_factor
+        self.increases = 0
+        self.decreases = 0
+        self._growth = 0.0
+        self._last_decrease = None
+
+    def record(self, latency, exc=None):
+        failed = exc is not None and is_transient(exc, range(500, 600))
+        if failed or latency > self.target_latency * self.spike_factor:
+            now = time.monotonic()
+            if self._last_decrease is None or now - self._last_decrease >= self.target_latency:
+                self._last_decrease = now
+                self._growth = 0.0
+                self.decreases += 1
+                self.limit = max(self.min_limit, int(self.limit * self.decrease_factor))
+        elif exc is None and latency <= self.target_latency and self.limit < self.max_limit:
+            self._growth += 1 / self.limit
+            if self._growth >= 1:
+                self._growth -= 1
+                self.increases += 1
+                self.limit += 1
+
+    @property
+    def stats(self):
+        stats = super().stats
+        stats.update({'increases': self.increases, 'decreases': self.decreases})
+        return stats
+
+
+class TokenBucket(object):
+    """
+    Limits requests to `rate` per second on average, allowing bursts of up to `burst` requests.
+    """
+    def __init__(self, rate, burst=None):
+        assert rate > 0
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1, rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self.total_wait = 0.0
+
+    async def acquire(self):
+        """
+        Takes a token, waiting for one if necessary, and returns how long that took in seconds.
+        """
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+        # Going into debt reserves our place in the queue behind earlier callers
+        self._tokens -= 1
+        if self._tokens >= 0:
+            return 0.0
+        wait = -self._tokens / self.rate
+        try:
+            await asyncio.sleep(wait)
+        except asyncio.CancelledError:
+            self._tokens += 1
+            raise
+        self.total_wait += wait
+        return wait
+
+    def __str__(self):
+        return '<TokenBucket {}/s, burst {}>'.format(self.rate, self.burst)
+    __repr__ = __str__
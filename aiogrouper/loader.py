@@ -0,0 +1,333 @@
+import argparse
+import asyncio
+import collections
+import concurrent.futures
+import csv
+import gzip
+import hashlib
+import itertools
+import json
+import logging
+import os
+import sys
+import time
+
+import aiohttp
+
+from .exceptions import GrouperException
+from .group import Group
+from .grouper import Grouper
+from .retry import RetryPolicy
+from .subject import Subject
+from .util import write_json_atomically
+
+__all__ = ['read_membership_rows', 'LoadSummary', 'MembershipLoader']
+
+logger = logging.getLogger('aiogrouper')
+
+_csv_header = ('group', 'group_name')
+
+
+class _Lines(object):
+    """
+    Decoded lines of a binary file, keeping count of the bytes read so far.
+    """
+    def __init__(self, f, encoding):
+        self._f = f
+        self.encoding = encoding
+        self.offset = f.tell()
+
+    def __iter__(self):
+        for line in self._f:
+            self.offset += len(line)
+            yield line.decode(self.encoding)
+
+
+def _open(path):
+    return gzip.open(path, 'rb') if path.endswith('.gz') else open(path, 'rb')
+
+
+def _identify(path):
+    """
+    Identifies a feed file by its path, size, modification time and a hash of its first block, so that a checkpoint
+    isn't applied to a different feed that happens to have the same path and size.
+    """
+    stat = os.stat(path)
+    with open(path, 'rb') as f:
+        head = hashlib.sha256(f.read(65536)).hexdigest()
+    return {'path': os.path.abspath(path), 'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'head': head}
+
+
+def _format(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    return 'jsonl' if name.endswith(('.jsonl', '.ndjson', '.json')) else 'csv'
+
+
+def read_membership_rows(path, *, format=None, offset=0, encoding='utf-8'):
+    """
+    Reads a membership feed a row at a time, yielding (group name, subject id, source, offset) tuples, where offset
+    is the byte offset just after the row; reading can be resumed from there by passing it back in.
+
+    CSV files have group name, subject id and (optionally) source columns, with an optional header row. JSONL files
+    have an object per line, with group, subject_id and (optionally) source keys. Either may be gzipped.
+    """
+    format = format or _format(path)
+    assert format in ('csv', 'jsonl')
+    with _open(path) as f:
+        f.seek(offset)
+        lines = _Lines(f, encoding)
+        if format == 'csv':
+            for row_number, row in enumerate(csv.reader(lines), 1):
+                if not row:
+                    continue
+                if row_number == 1 and offset == 0 and row[0].strip().lower() in _csv_header:
+                    continue
+                if len(row) not in (2, 3) or not row[0] or not row[1]:
+                    raise ValueError('{}: row {}: expected group name, subject id and source, not {!r}'.format(
+                        path, row_number, row))
+                yield row[0], row[1], row[2] if len(row) == 3 and row[2] else None, lines.offset
+        else:
+            for line_number, line in enumerate(lines, 1):
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                if not row.get('group') or not row.get('subject_id'):
+                    raise ValueError('{}: line {}: expected group and subject_id, not {!r}'.format(
+                        path, line_number, row))
+                yield row['group'], row['subject_id'], row.get('source') or None, lines.offset
+
+
+class LoadSummary(object):
+    """
+    What a MembershipLoader did: how many rows and groups it got through, and the membership changes it made.
+    """
+    def __init__(self, *, resumed_from=0):
+        self.resumed_from = resumed_from
+        self.rows = 0
+        self.groups = 0
+        self.added = 0
+        self.removed = 0
+        self.unchanged = 0
+        self.not_found = 0
+        self.failed = collections.OrderedDict()
+        self.duration = 0.0
+
+    def rate(self, count):
+        return count / self.duration if self.duration else 0.0
+
+    def report(self):
+        """
+        A human-readable account of the load, one figure to a line.
+        """
+        lines = ['{} rows in {} groups in {:.1f}s ({:.0f} rows/s, {:.1f} groups/s)'.format(
+                     self.rows, self.groups, self.duration, self.rate(self.rows), self.rate(self.groups)),
+                 '{} added, {} removed, {} unchanged, {} not found'.format(
+                     self.added, self.removed, self.unchanged, self.not_found)]
+        if self.resumed_from:
+            lines.append('resumed from byte {}'.format(self.resumed_from))
+        if self.failed:
+            lines.append('{} groups failed: {}'.format(len(self.failed), ', '.join(self.failed)))
+        return '\n'.join(lines)
+
+    def __str__(self):
+        return '<LoadSummary {} rows, {} groups, +{} -{}, {} failed>'.format(self.rows, self.groups, self.added,
+                                                                             self.removed, len(self.failed))
+    __repr__ = __str__
+
+
+class MembershipLoader(object):
+    """
+    Makes the direct membership of each group in a feed match the feed, streaming it rather than reading it all in.
+
+    A group's rows must be contiguous, as they are in a feed sorted by group name. Each group is compared with its
+    current membership and only the differences are sent, with up to `concurrency` groups being worked on at once and
+    each group's additions and removals sent in chunks. Groups that aren't in the feed are left alone.
+
+    With a checkpoint file, progress is recorded as a byte offset into the feed, every `checkpoint_interval` seconds
+    and at the end. The offset never passes a group that hasn't been loaded successfully, so loading the same feed
+    again resumes with the first group that wasn't finished. A checkpoint for any other feed, including a new feed
+    written to the same path, is ignored.
+    """
+    def __init__(self, grouper, *, concurrency=4, batch_size=None, member_concurrency=None, checkpoint=None,
+                 checkpoint_interval=10.0):
+        """
+        :param batch_size: Subjects per add or delete member request; by default the Grouper's member_batch_size
+        :param member_concurrency: Add or delete requests in flight per group; by default the Grouper's
+        :param checkpoint: A path to record progress in
+        """
+        assert concurrency >= 1
+        self.grouper = grouper
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.member_concurrency = member_concurrency
+        self.checkpoint = checkpoint
+        self.checkpoint_interval = checkpoint_interval
+
+    def _resume_offset(self, feed):
+        if not (self.checkpoint and os.path.exists(self.checkpoint)):
+            return 0
+        with open(self.checkpoint) as f:
+            data = json.load(f)
+        if data.get('feed') != feed:
+            # e.g. the next day's feed, written to the same path
+            logger.warning("Checkpoint %s is for a different feed; starting from the beginning", self.checkpoint)
+            return 0
+        return data['offset']
+
+    def _save_checkpoint(self, feed, offset):
+        write_json_atomically(self.checkpoint, {'feed': feed, 'offset': offset})
+
+    def _groups(self, rows):
+        seen = set()
+        for group_name, group_rows in itertools.groupby(rows, key=lambda row: row[0]):
+            if group_name in seen:
+                raise ValueError('The rows for group {} are not contiguous; sort the feed by group name'.format(
+                    group_name))
+            seen.add(group_name)
+            # Repeated rows are only sent once
+            members, count = collections.OrderedDict(), 0
+            for _, subject_id, source, offset in group_rows:
+                members[subject_id, source] = None
+                count += 1
+            yield group_name, [Subject(id=subject_id, source=source) for subject_id, source in members], count, offset
+
+    async def _load_group(self, group_name, members, summary):
+        try:
+            changes = await self.grouper.set_members(Group(self.grouper, name=group_name), members,
+                                                     batch_size=self.batch_size,
+                                                     concurrency=self.member_concurrency)
+        except (GrouperException, aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning("Couldn't load members of %s: %s", group_name, e)
+            summary.failed[group_name] = e
+            return False
+        summary.added += len(changes.added)
+        summary.removed += len(changes.removed)
+        summary.unchanged += len(changes.unchanged)
+        summary.not_found += len(changes.not_found)
+        return True
+
+    async def load(self, path, *, format=None):
+        """
+        Loads a feed (see read_membership_rows), returning a LoadSummary.
+        """
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        # The feed is hashed, decompressed and parsed on a thread of its own, a chunk of groups at a time, so that a
+        # large feed doesn't hold up the requests (and deadlines) in flight. One thread keeps the reads in order.
+        reader = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        feed = await loop.run_in_executor(reader, _identify, path)
+        offset = self._resume_offset(feed)
+        summary = LoadSummary(resumed_from=offset)
+        semaphore = asyncio.Semaphore(self.concurrency)
+        # Groups finish out of order; the checkpoint only moves past a group once it and everything before it are
+        # done. It can never move past a failed group, so nothing after the first failure needs keeping.
+        finished, next_to_finish, first_failed, last_saved = {}, 0, None, time.monotonic()
+        tasks, error = set(), None
+
+        def done(sequence, end, task):
+            nonlocal offset, next_to_finish, first_failed, last_saved, error
+            semaphore.release()
+            tasks.discard(task)
+            if task.cancelled():
+                return
+            summary.groups += 1
+            if task.exception() is not None:
+                # Anything other than a failure to load the group stops the load
+                error = error or task.exception()
+            if task.exception() is not None or not task.result():
+                first_failed = sequence if first_failed is None else min(first_failed, sequence)
+                for later in [s for s in finished if s > first_failed]:
+                    del finished[later]
+            elif first_failed is None or sequence < first_failed:
+                finished[sequence] = end
+            while next_to_finish in finished:
+                offset = finished.pop(next_to_finish)
+                next_to_finish += 1
+            if time.monotonic() - last_saved >= self.checkpoint_interval:
+                last_saved = time.monotonic()
+                summary.duration = time.perf_counter() - start
+                logger.info('%d groups, %d rows, %.0f rows/s', summary.groups, summary.rows,
+                            summary.rate(summary.rows))
+                if self.checkpoint:
+                    self._save_checkpoint(feed, offset)
+
+        groups = self._groups(read_membership_rows(path, format=format, offset=offset))
+
+        def read_chunk():
+            return list(itertools.islice(groups, self.concurrency))
+
+        try:
+            sequences = itertools.count()
+            chunk = await loop.run_in_executor(reader, read_chunk)
+            while chunk:
+                # The next chunk is read while this one is sent
+                reading = loop.run_in_executor(reader, read_chunk)
+                for group_name, members, count, end in chunk:
+                    summary.rows += count
+                    await semaphore.acquire()
+                    if error is not None:
+                        raise error
+                    task = asyncio.ensure_future(self._load_group(group_name, members, summary))
+                    task.add_done_callback(lambda task, sequence=next(sequences), end=end: done(sequence, end, task))
+                    tasks.add(task)
+                chunk = await reading
+            if tasks:
+                await asyncio.wait(list(tasks))
+            if error is not None:
+                raise error
+        finally:
+            for task in tasks:
+                task.cancel()
+            # Closes the feed once any read still running has finished
+            reader.submit(groups.close)
+            reader.shutdown(wait=False)
+            if self.checkpoint:
+                self._save_checkpoint(feed, offset)
+            summary.duration = time.perf_counter() - start
+        return summary
+
+
+async def _run(options):
+    auth = aiohttp.BasicAuth(options.username, os.environ.get('GROUPER_PASSWORD', '')) if options.username else None
+    retry_policy = RetryPolicy(max_attempts=options.attempts) if options.attempts > 1 else None
+    async with aiohttp.ClientSession(auth=auth) as session:
+        grouper = Grouper(options.url, session=session, retry_policy=retry_policy,
+                          max_in_flight=options.max_in_flight)
+        loader = MembershipLoader(grouper, concurrency=options.concurrency, batch_size=options.batch_size,
+                                  member_concurrency=options.member_concurrency, checkpoint=options.checkpoint,
+                                  checkpoint_interval=options.checkpoint_interval)
+        return await loader.load(options.path, format=options.format)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='aiogrouper-load-members',
+                                     description="Make the direct members of the groups in a CSV or JSONL feed match "
+                                                 "the feed. The password is read from GROUPER_PASSWORD.")
+    parser.add_argument('path', help="The feed, sorted by group name; .csv, .jsonl, or either gzipped")
+    parser.add_argument('--url', default=os.environ.get('GROUPER_URL'),
+                        help="Grouper's base URL (default: GROUPER_URL)")
+    parser.add_argument('--username', default=os.environ.get('GROUPER_USERNAME'),
+                        help="Username for basic auth (default: GROUPER_USERNAME)")
+    parser.add_argument('--format', choices=('csv', 'jsonl'), help="Feed format, if not given by its extension")
+    parser.add_argument('--concurrency', type=int, default=4, help="Groups loaded at once (default: %(default)s)")
+    parser.add_argument('--batch-size', type=int, help="Subjects per add or delete member request")
+    parser.add_argument('--member-concurrency', type=int, help="Add or delete member requests in flight per group")
+    parser.add_argument('--max-in-flight', type=int, help="Requests in flight in all")
+    parser.add_argument('--attempts', type=int, default=3,
+                        help="Attempts per read request (default: %(default)s); member additions and removals aren't "
+                             "retried, but a group that fails is loaded again by a rerun with --checkpoint")
+    parser.add_argument('--checkpoint', help="Record progress in this file, and resume from it")
+    parser.add_argument('--checkpoint-interval', type=float, default=10.0,
+                        help="Seconds between checkpoints (default: %(default)s)")
+    parser.add_argument('-v', '--verbose', action='store_true', help="Log progress")
+    options = parser.parse_args(argv)
+    if not options.url:
+        parser.error('--url or GROUPER_URL is required')
+    logging.basicConfig(level=logging.INFO if options.verbose else logging.WARNING, format='%(asctime)s %(message)s')
+    summary = asyncio.run(_run(options))
+    print(summary.report(), file=sys.stderr)
+    return 1 if summary.failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
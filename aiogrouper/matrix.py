@@ -0,0 +1,179 @@
+import array
+import collections
+import numbers
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None
+
+__all__ = ['MembershipMatrix']
+
+
+class MembershipMatrix(object):
+    """
+    A compact, columnar form of get_memberships results, for bulk reporting.
+
+    Subjects and owners (groups and stems) are each stored once in `subjects` and `owners`, and every membership is
+    a pair of indexes into those tables, held in the parallel integer arrays `subject_indexes` and `owner_indexes`.
+    Helpers return subject/owner indexes; with NumPy installed they return NumPy arrays and use vectorised
+    operations, and otherwise plain arrays, lists and sets.
+    """
+    typecode = 'l'
+
+    def __init__(self):
+        self.subjects, self.owners = [], []
+        self.subject_index, self.owner_index = {}, {}
+        self.subject_indexes = array.array(self.typecode)
+        self.owner_indexes = array.array(self.typecode)
+        self._by_owner = self._by_subject = None
+
+    @classmethod
+    def from_pairs(cls, pairs, subjects=()):
+        """
+        :param subjects: Subjects to include even if they have no memberships
+        """
+        matrix = cls()
+        for subject in subjects:
+            matrix._subject(subject)
+        for subject, owner in pairs:
+            matrix.add(subject, owner)
+        return matrix
+
+    def _subject(self, subject):
+        try:
+            return self.subject_index[subject]
+        except KeyError:
+            index = self.subject_index[subject] = len(self.subjects)
+            self.subjects.append(subject)
+            return index
+
+    def _owner(self, owner):
+        try:
+            return self.owner_index[owner]
+        except KeyError:
+            index = self.owner_index[owner] = len(self.owners)
+            self.owners.append(owner)
+            return index
+
+    def add(self, subject, owner):
+        self.subject_indexes.append(self._subject(subject))
+        self.owner_indexes.append(self._owner(owner))
+        self._by_owner = self._by_subject = None
+
+    def __len__(self):
+        return len(self.subject_indexes)
+
+    # Conversion
+
+    def as_numpy(self):
+        """
+        Returns (subject_indexes, owner_indexes) as NumPy arrays sharing memory with the underlying arrays.
+        """
+        if numpy is None:
+            raise ImportError("NumPy is required for MembershipMatrix.as_numpy()")
+        return (numpy.frombuffer(self.subject_indexes, dtype=numpy.dtype(self.typecode)),
+                numpy.frombuffer(self.owner_indexes, dtype=numpy.dtype(self.typecode)))
+
+    def to_dict(self):
+        """
+        Returns the subject → set of owners mapping that get_memberships would have, which leaves out subjects
+        without memberships.
+        """
+        results = collections.defaultdict(set)
+        for subject_index, owner_index in zip(self.subject_indexes, self.owner_indexes):
+            results[self.subjects[subject_index]].add(self.owners[owner_index])
+        return dict(results)
+
+    # Queries
+
+    def _group_by(self, keys, values, size):
+        if numpy is not None:
+            keys, values = numpy.frombuffer(keys, dtype=numpy.dtype(self.typecode)), \
+                           numpy.frombuffer(values, dtype=numpy.dtype(self.typecode))
+            order = numpy.argsort(keys, kind='stable')
+            offsets = numpy.concatenate(([0], numpy.cumsum(numpy.bincount(keys, minlength=size))))
+            return values[order], offsets
+        grouped = [array.array(self.typecode) for _ in range(size)]
+        for key, value in zip(keys, values):
+            grouped[key].append(value)
+        return grouped, None
+
+    def _lookup(self, grouped, index):
+        values, offsets = grouped
+        if offsets is None:
+            return values[index]
+        return values[offsets[index]:offsets[index + 1]]
+
+    def subjects_of(self, owner):
+        """
+        The indexes of the subjects that are members of an owner (given as an object or index, including the NumPy
+        integers the other helpers return).
+        """
+        if self._by_owner is None:
+            self._by_owner = self._group_by(self.owner_indexes, self.subject_indexes, len(self.owners))
+        return self._lookup(self._by_owner, owner if isinstance(owner, numbers.Integral) else self.owner_index[owner])
+
+    def owners_of(self, subject):
+        """
+        The indexes of the owners a subject (given as an object or index) is a member of.
+        """
+        if self._by_subject is None:
+            self._by_subject = self._group_by(self.subject_indexes, self.owner_indexes, len(self.subjects))
+        return self._lookup(self._by_subject, subject if isinstance(subject, numbers.Integral) else self.subject_index[subject])
+
+    def owner_counts(self):
+        """
+        The number of members of each owner, in the order of `owners`.
+        """
+        return self._counts(self.owner_indexes, len(self.owners))
+
+    def subject_counts(self):
+        """
+        The number of memberships of each subject, in the order of `subjects`.
+        """
+        return self._counts(self.subject_indexes, len(self.subjects))
+
+    def _counts(self, indexes, size):
+        if numpy is not None:
+            return numpy.bincount(numpy.frombuffer(indexes, dtype=numpy.dtype(self.typecode)), minlength=size)
+        counts = [0] * size
+        for index in indexes:
+            counts[index] += 1
+        return counts
+
+    def members_of_all(self, *owners):
+        """
+        The indexes of subjects that are members of every one of the given owners.
+        """
+        return self._combine(owners, 'intersection')
+
+    def members_of_any(self, *owners):
+        """
+        The indexes of subjects that are members of at least one of the given owners.
+        """
+        return self._combine(owners, 'union')
+
+    def members_of_first_only(self, owner, *others):
+        """
+        The indexes of subjects that are members of the first owner but none of the others.
+        """
+        return self._combine((owner,) + others, 'difference')
+
+    _numpy_operations = {'intersection': 'intersect1d', 'union': 'union1d', 'difference': 'setdiff1d'}
+
+    def _combine(self, owners, operation):
+        members = [self.subjects_of(owner) for owner in owners]
+        if not members:
+            return numpy.array([], dtype=numpy.dtype(self.typecode)) if numpy is not None else set()
+        if numpy is not None:
+            result = numpy.unique(members[0])
+            for other in members[1:]:
+                result = getattr(numpy, self._numpy_operations[operation])(result, other)
+            return result
+        return getattr(set(members[0]), operation)(*members[1:])
+
+    def __str__(self):
+        return '<MembershipMatrix {} subjects, {} owners, {} memberships>'.format(len(self.subjects),
+                                                                                 len(self.owners), len(self))
+    __repr__ = __str__
@@ -0,0 +1,21 @@
+__all__ = ['MembershipChanges']
+
+
+class MembershipChanges:
+    """
+    Summary of a Grouper.set_members sync: which subjects were added to and removed from the group, which were already
+    members, and which couldn't be resolved by Grouper.
+    """
+    def __init__(self, *, added=(), removed=(), unchanged=(), not_found=()):
+        self.added = list(added)
+        self.removed = list(removed)
+        self.unchanged = list(unchanged)
+        self.not_found = list(not_found)
+
+    def __bool__(self):
+        return bool(self.added or self.removed)
+
+    def __str__(self):
+        return '<MembershipChanges +{} -{} ={} ?{}>'.format(len(self.added), len(self.removed),
+                                                           len(self.unchanged), len(self.not_found))
+    __repr__ = __str__
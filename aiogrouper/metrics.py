@@ -0,0 +1,128 @@
+import bisect
+import collections
+import logging
+
+__all__ = ['RequestEvent', 'Observer', 'HistogramCollector']
+
+logger = logging.getLogger('aiogrouper')
+
+
+class RequestEvent(object):
+    """
+    Timings and sizes for a single attempt at a Grouper WS request, passed to each of Grouper.observers.
+
+    Times are in seconds, measured with time.monotonic(). `queue_time` covers waiting on the rate limiter and the
+    in-flight limit, `network_time` sending the request and reading the response, and `parse_time` parse_response.
+    `hedged` is set when a second copy of the request was sent, and `hedge_won` when that copy answered first.
+    """
+    __slots__ = ('operation', 'method', 'url', 'attempt', 'status', 'result_code', 'request_bytes',
+                 'response_bytes', 'queue_time', 'network_time', 'parse_time', 'object_count', 'error',
+                 'hedged', 'hedge_won')
+
+    def __init__(self, operation, method, url, attempt=1, request_bytes=0):
+        self.operation, self.method, self.url = operation, method, url
+        self.attempt = attempt
+        self.request_bytes = request_bytes
+        self.status = self.result_code = self.error = self.object_count = None
+        self.response_bytes = 0
+        self.queue_time = self.network_time = self.parse_time = 0.0
+        self.hedged = self.hedge_won = False
+
+    @property
+    def duration(self):
+        return self.queue_time + self.network_time + self.parse_time
+
+    def __str__(self):
+        return '<RequestEvent {} {} {:.1f}ms>'.format(self.operation, self.status or self.error,
+                                                       self.duration * 1000)
+    __repr__ = __str__
+
+
+class Observer(object):
+    """
+    Base class for things that want to hear about each request Grouper makes.
+    """
+    def request_completed(self, event):
+        pass
+
+
+def notify(observers, event):
+    for observer in observers:
+        try:
+            observer.request_completed(event)
+        except Exception:
+            logger.exception("Grouper observer %r failed", observer)
+
+
+class Histogram(object):
+    # Upper bounds in seconds, roughly logarithmic from 1ms to a minute
+    default_buckets = (.001, .0025, .005, .01, .025, .05, .1, .25, .5, 1, 2.5, 5, 10, 30, 60, float('inf'))
+
+    def __init__(self, buckets=None):
+        self.buckets = tuple(buckets or self.default_buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[min(bisect.bisect_left(self.buckets, value), len(self.buckets) - 1)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q):
+        """
+        An upper bound on the q-quantile, from the bucket it falls in.
+        """
+        if not self.count:
+            return None
+        rank, seen = q * self.count, 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return self.buckets[-1]
+
+    def to_dict(self):
+        return {'buckets': dict(zip(self.buckets, self.counts)), 'count': self.count, 'sum': self.sum}
+
+
+class HistogramCollector(Observer):
+    """
+    Keeps in-memory latency histograms and counters per operation, for scraping into a monitoring system.
+    """
+    timings = ('duration', 'queue_time', 'network_time', 'parse_time')
+
+    def __init__(self, buckets=None):
+        self.buckets = buckets
+        self.histograms = collections.defaultdict(lambda: {timing: Histogram(self.buckets) for timing in self.timings})
+        self.statuses = collections.defaultdict(collections.Counter)
+        self.errors = collections.Counter()
+        self.request_bytes = collections.Counter()
+        self.response_bytes = collections.Counter()
+        self.objects = collections.Counter()
+
+    def request_completed(self, event):
+        histograms = self.histograms[event.operation]
+        for timing in self.timings:
+            histograms[timing].observe(getattr(event, timing))
+        self.statuses[event.operation][event.status] += 1
+        if event.error is not None:
+            self.errors[event.operation] += 1
+        self.request_bytes[event.operation] += event.request_bytes
+        self.response_bytes[event.operation] += event.response_bytes
+        self.objects[event.operation] += event.object_count or 0
+
+    def snapshot(self):
+        return {operation: {
+            'timings': {timing: histogram.to_dict() for timing, histogram in histograms.items()},
+            'p50': histograms['duration'].quantile(.5),
+            'p99': histograms['duration'].quantile(.99),
+            'statuses': dict(self.statuses[operation]),
+            'errors': self.errors[operation],
+            'request_bytes': self.request_bytes[operation],
+            'response_bytes': self.response_bytes[operation],
+            'objects': self.objects[operation],
+        } for operation, histograms in self.histograms.items()}
+
+    def reset(self):
+        self.__init__(self.buckets)
@@ -0,0 +1,88 @@
+import asyncio
+import collections
+
+__all__ = ['PageIterator']
+
+
+def _retrieve_exception(future):
+    if not future.cancelled():
+        future.exception()
+
+
+class PageIterator:
+    """
+    An asynchronous iterator over the items of a paged Grouper WS call.
+
+    `fetch_page(page_number)` is a coroutine function returning the list of items on a page, numbered from 1. A page
+    shorter than `page_size` is taken to be the last, as is a longer one or a repeat of the previous one, which mean
+    the server isn't paging. With `prefetch`, the next page is requested as soon as the current one arrives, so it
+    can load while the caller works through the current page.
+    """
+    def __init__(self, fetch_page, page_size, *, prefetch=True):
+        assert page_size > 0
+        self._fetch_page = fetch_page
+        self.page_size = page_size
+        self.prefetch = prefetch
+        self.pages_fetched = 0
+        self._page_number = 1
+        self._items = collections.deque()
+        self._next_page = None
+        self._exhausted = False
+        self._last_page = None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while not self._items:
+            if self._exhausted:
+                raise StopAsyncIteration
+            self._items.extend(await self._get_page())
+        return self._items.popleft()
+
+    async def next_page(self):
+        """
+        Returns the remaining items of the current page, or the whole of the next one, or an empty list when done.
+        """
+        if not self._items and not self._exhausted:
+            self._items.extend(await self._get_page())
+        page = list(self._items)
+        self._items.clear()
+        return page
+
+    def _request_page(self):
+        future = asyncio.ensure_future(self._fetch_page(self._page_number))
+        # A prefetched page is abandoned if the caller stops iterating without calling aclose()
+        future.add_done_callback(_retrieve_exception)
+        self._page_number += 1
+        return future
+
+    async def _get_page(self):
+        future, self._next_page = self._next_page or self._request_page(), None
+        page = await future
+        self.pages_fetched += 1
+        if page and page == self._last_page:
+            # The server has ignored the paging parameters and sent the same page again
+            self._exhausted = True
+            return []
+        self._last_page = page
+        if len(page) != self.page_size:
+            # A longer page means the server has ignored them and sent everything at once
+            self._exhausted = True
+        elif self.prefetch:
+            self._next_page = self._request_page()
+        return page
+
+    async def aclose(self):
+        """
+        Stops iterating, cancelling any page that's been prefetched.
+        """
+        self._exhausted = True
+        self._items.clear()
+        if self._next_page is not None:
+            self._next_page.cancel()
+            try:
+                await self._next_page
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._next_page = None
@@ -1,19 +1,51 @@
 import abc
+import copy
 
-__all__ = ['Query', 'BinaryOperator', 'And', 'Or', 'Minus', 'FindByStemName']
+from .util import bool_to_tf
+
+__all__ = ['Query', 'BinaryOperator', 'And', 'Or', 'Minus', 'FindByStemName', 'FindByParentStemName']
 
 
 class Query(metaclass=abc.ABCMeta):
+    page_size = None
+    page_number = None
+    sort_string = None
+    ascending = None
+
     @property
     @abc.abstractmethod
     def query_type(self):
         pass
 
+    def paged(self, page_size, page_number=1, *, sort_string=None, ascending=None):
+        """
+        Returns a copy of this query that only asks for one page of results.
+
+        :param page_size: The number of results per page
+        :param page_number: Which page to return, starting at 1
+        :param sort_string: The field to sort on (e.g. 'name', 'displayName', 'extension'), to keep pages stable
+        :param ascending: Sort order; the server's default if None
+        """
+        assert page_size > 0 and page_number > 0
+        query = copy.copy(self)
+        query.page_size, query.page_number = page_size, page_number
+        query.sort_string = sort_string if sort_string is not None else self.sort_string
+        query.ascending = ascending if ascending is not None else self.ascending
+        return query
+
     def to_json(self, stem_query=False):
         if stem_query:
-            return {'stemQueryFilterType': self.query_type}
+            data = {'stemQueryFilterType': self.query_type}
         else:
-            return {'queryFilterType': self.query_type}
+            data = {'queryFilterType': self.query_type}
+        if self.page_size is not None:
+            data['pageSize'] = str(self.page_size)
+            data['pageNumber'] = str(self.page_number)
+        if self.sort_string is not None:
+            data['sortString'] = self.sort_string
+        if self.ascending is not None:
+            data['ascending'] = bool_to_tf(self.ascending)
+        return data
 
     def __and__(self, other):
         return And(self, other)
@@ -31,8 +63,9 @@ class BinaryOperator(Query):
 
     def to_json(self, **kwargs):
         data = super().to_json(**kwargs)
-        data.update({'queryFilter0': self.left,
-                     'queryFilter1': self.right})
+        data.update({'queryFilter0': self.left.to_json(**kwargs),
+                     'queryFilter1': self.right.to_json(**kwargs)})
+        return data
 
 
 class And(BinaryOperator):
@@ -64,10 +97,12 @@ class FindByStemName(Query):
 class FindByParentStemName(Query):
     query_type = 'FIND_BY_PARENT_STEM_NAME'
 
-    def __init__(self, parent_stem_name):
+    def __init__(self, parent_stem_name, recursive=False):
         self.parent_stem_name = parent_stem_name
+        self.recursive = recursive
 
     def to_json(self, **kwargs):
         data = super().to_json(**kwargs)
         data['parentStemName'] = self.parent_stem_name
+        data['parentStemNameScope'] = 'ALL_IN_SUBTREE' if self.recursive else 'ONE_LEVEL'
         return data
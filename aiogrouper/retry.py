@@ -0,0 +1,144 @@
+import asyncio
+import random
+import time
+
+import aiohttp
+
+from .enum import SaveMode
+from .exceptions import GrouperCircuitOpenException, GrouperHTTPException
+
+__all__ = ['RetryPolicy', 'CircuitBreaker', 'is_idempotent']
+
+# Requests that only read from Grouper, so can safely be sent again
+READ_REQUESTS = frozenset([
+    'WsRestFindGroupsRequest',
+    'WsRestFindStemsRequest',
+    'WsRestGetMembersRequest',
+    'WsRestGetMembersLiteRequest',
+    'WsRestGetMembershipsRequest',
+    'WsRestHasMemberRequest',
+    'WsRestGetGrouperPrivilegesLiteRequest',
+])
+
+SAVE_REQUESTS = {
+    'WsRestGroupSaveRequest': 'wsGroupToSaves',
+    'WsRestStemSaveRequest': 'wsStemToSaves',
+}
+
+
+def is_idempotent(method, data):
+    """
+    Whether sending a request more than once has the same effect as sending it once.
+
+    :param data: The request body as a dict, before serialization. A body that has already been serialized isn't
+        looked into, so is taken not to be idempotent.
+    """
+    if method == 'get' or not data:
+        return True
+    if not isinstance(data, dict):
+        return False
+    request_name, body = next(iter(data.items()))
+    if request_name in READ_REQUESTS:
+        return True
+    if request_name in SAVE_REQUESTS:
+        return all(to_save.get('saveMode') in (SaveMode.insert_or_update.value, SaveMode.update.value)
+                   for to_save in body.get(SAVE_REQUESTS[request_name], ()))
+    return False
+
+
+def is_transient(exc, statuses):
+    if isinstance(exc, GrouperHTTPException):
+        return exc.response.status in statuses
+    return isinstance(exc, (aiohttp.ClientConnectionError, aiohttp.ServerDisconnectedError, asyncio.TimeoutError))
+
+
+class RetryPolicy(object):
+    """
+    Decides whether a failed request is sent again, and how long to wait first.
+
+    Connection errors, timeouts and the given HTTP statuses are retried up to `max_attempts` attempts in all, with
+    exponential backoff and full jitter. Requests that aren't idempotent are only retried if `retry_non_idempotent`
+    is set, or the caller passes idempotent=True to Grouper.request.
+    """
+    def __init__(self, *, max_attempts=3, backoff=0.2, max_backoff=10.0, jitter=True,
+                 statuses=(429, 502, 503, 504), exceptions=(), retry_non_idempotent=False):
+        assert max_attempts >= 1
+        self.max_attempts = max_attempts
+        self.backoff, self.max_backoff = backoff, max_backoff
+        self.jitter = jitter
+        self.statuses = frozenset(statuses)
+        self.exceptions = tuple(exceptions)
+        self.retry_non_idempotent = retry_non_idempotent
+
+    def should_retry(self, exc, attempt, idempotent):
+        """
+        :param attempt: The number of attempts made so far
+        """
+        if attempt >= self.max_attempts or not (idempotent or self.retry_non_idempotent):
+            return False
+        return is_transient(exc, self.statuses) or isinstance(exc, self.exceptions)
+
+    def delay(self, attempt):
+        delay = min(self.max_backoff, self.backoff * 2 ** (attempt - 1))
+        return random.uniform(0, delay) if self.jitter else delay
+
+
+class CircuitBreaker(object):
+    """
+    Fails requests fast once Grouper looks unhealthy.
+
+    After `failure_threshold` consecutive transient failures the circuit opens, and requests raise
+    GrouperCircuitOpenException for `reset_timeout` seconds. After that a single trial request is let through; if it
+    succeeds the circuit closes again, and if it fails the circuit stays open for another `reset_timeout`.
+    """
+    closed, open, half_open = 'closed', 'open', 'half-open'
+
+    def __init__(self, *, failure_threshold=5, reset_timeout=30.0, statuses=(429, 502, 503, 504)):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.statuses = frozenset(statuses)
+        self.state = self.closed
+        self.failures = 0
+        self.opened_at = None
+        self.times_opened = 0
+        self._trial_started = None
+
+    def before_request(self):
+        if self.state == self.closed:
+            return
+        now = time.monotonic()
+        remaining = self.opened_at + self.reset_timeout - now
+        # A trial that never reported back (e.g. it was cancelled) doesn't block further trials forever
+        if remaining > 0 or (self._trial_started is not None and now - self._trial_started < self.reset_timeout):
+            raise GrouperCircuitOpenException(max(remaining, 0))
+        self.state = self.half_open
+        self._trial_started = now
+
+    def record_success(self):
+        self.state = self.closed
+        self.failures = 0
+        self._trial_started = None
+
+    def record_cancelled(self):
+        """
+        A request was abandoned without an answer, which says nothing about Grouper's health. If it was the trial,
+        another can be let through straight away.
+        """
+        self._trial_started = None
+
+    def record_failure(self, exc):
+        if not is_transient(exc, self.statuses):
+            # Grouper answered, so it's healthy even if it didn't like the request
+            self.record_success()
+            return
+        self.failures += 1
+        self._trial_started = None
+        if self.state == self.half_open or self.failures >= self.failure_threshold:
+            if self.state != self.open:
+                self.times_opened += 1
+            self.state = self.open
+            self.opened_at = time.monotonic()
+
+    def __str__(self):
+        return '<CircuitBreaker {} ({} failures)>'.format(self.state, self.failures)
+    __repr__ = __str__
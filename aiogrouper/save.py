@@ -0,0 +1,46 @@
+import collections
+
+__all__ = ['SaveResult']
+
+
+class SaveResult(list):
+    """
+    The outcome of Grouper.save_groups or Grouper.save_stems.
+
+    As a list it holds the saved groups or stems, in the order they were passed in, leaving out any that failed (so
+    it only lines up with the objects passed in when nothing failed, which save_groups and save_stems ensure unless
+    called with raise_on_error=False).
+    `results` maps each GroupToSave or StemToSave to its ResultCode, and `errors` maps failed ones to the exception
+    raised for their request, where there was one.
+    """
+    def __init__(self, to_saves):
+        super().__init__()
+        self.to_saves = list(to_saves)
+        self.results = collections.OrderedDict()
+        self.errors = collections.OrderedDict()
+        self._saved = {}
+
+    def _record(self, to_save, result_code, saved=None, error=None):
+        self.results[to_save] = result_code
+        if saved is not None:
+            self._saved[to_save] = saved
+        if error is not None:
+            self.errors[to_save] = error
+
+    def _finish(self):
+        self.results = collections.OrderedDict((s, self.results[s]) for s in self.to_saves if s in self.results)
+        self.extend(self._saved[s] for s in self.to_saves if s in self._saved)
+        self._saved = None
+        return self
+
+    @property
+    def succeeded(self):
+        return [to_save for to_save, result_code in self.results.items() if result_code.is_success]
+
+    @property
+    def failed(self):
+        return [to_save for to_save, result_code in self.results.items() if not result_code.is_success]
+
+    def __str__(self):
+        return '<SaveResult {} saved, {} failed>'.format(len(self.succeeded), len(self.failed))
+    __repr__ = __str__
@@ -0,0 +1,231 @@
+import asyncio
+import collections
+import hashlib
+import json
+import logging
+import os
+import sys
+
+import aiohttp
+
+from .enum import MemberFilter
+from .exceptions import GrouperException
+from .group import Group
+from .util import bounded_gather, write_json_atomically
+
+__all__ = ['MembershipEvent', 'GroupSnapshot', 'SnapshotStore', 'ChangeSet', 'ChangeFeed']
+
+logger = logging.getLogger('aiogrouper')
+
+
+def membership_digest(subject_ids):
+    """
+    An order-independent hash of a set of subject ids, stable across processes. Computing it doesn't need a sort, so
+    an unchanged group can be recognised in one pass over its members. The ids must be distinct.
+    """
+    total = 0
+    for subject_id in subject_ids:
+        total += int.from_bytes(hashlib.blake2b(subject_id.encode(), digest_size=8).digest(), 'little')
+    return '{:x}'.format(total & 0xffffffffffffffff)
+
+
+class MembershipEvent(object):
+    """
+    A subject being added to or removed from a group between two polls.
+    """
+    __slots__ = ('kind', 'group_name', 'subject_id')
+
+    add, remove = 'add', 'remove'
+
+    def __init__(self, kind, group_name, subject_id):
+        self.kind = kind
+        self.group_name = group_name
+        self.subject_id = subject_id
+
+    def __eq__(self, other):
+        if not isinstance(other, MembershipEvent):
+            return NotImplemented
+        return (self.kind, self.group_name, self.subject_id) == (other.kind, other.group_name, other.subject_id)
+
+    def __hash__(self):
+        return hash((self.kind, self.group_name, self.subject_id))
+
+    def __str__(self):
+        return '<MembershipEvent {} {} {}>'.format(self.kind, self.group_name, self.subject_id)
+    __repr__ = __str__
+
+
+class GroupSnapshot(object):
+    """
+    The members of a group as last seen: a frozenset of subject ids, with their count and digest.
+    """
+    __slots__ = ('group_name', 'members', 'digest')
+
+    def __init__(self, group_name, members, digest=None):
+        self.group_name = group_name
+        # Subject ids are interned, as the same subjects tend to turn up in many groups
+        self.members = frozenset(sys.intern(subject_id) for subject_id in members)
+        self.digest = digest or membership_digest(self.members)
+
+    def __len__(self):
+        return len(self.members)
+
+    def __str__(self):
+        return '<GroupSnapshot {}: {} members, {}>'.format(self.group_name, len(self.members), self.digest)
+    __repr__ = __str__
+
+
+class SnapshotStore(object):
+    """
+    GroupSnapshots keyed by group name, optionally persisted to a JSON file so that a restart can carry on from the
+    last poll.
+    """
+    def __init__(self, path=None):
+        self.path = path
+        self.snapshots = {}
+        if path and os.path.exists(path):
+            self.load()
+
+    def get(self, group_name):
+        return self.snapshots.get(group_name)
+
+    def __contains__(self, group_name):
+        return group_name in self.snapshots
+
+    def __len__(self):
+        return len(self.snapshots)
+
+    def diff(self, snapshot):
+        """
+        Returns the events that lead from the stored snapshot of a group to a new one.
+        """
+        previous = self.snapshots.get(snapshot.group_name)
+        old = previous.members if previous else frozenset()
+        if previous is not None and previous.digest == snapshot.digest:
+            return []
+        name = snapshot.group_name
+        return ([MembershipEvent(MembershipEvent.remove, name, s) for s in sorted(old - snapshot.members)] +
+                [MembershipEvent(MembershipEvent.add, name, s) for s in sorted(snapshot.members - old)])
+
+    def update(self, snapshot):
+        """
+        Stores a new snapshot, returning the events that lead to it from the previous one.
+        """
+        events = self.diff(snapshot)
+        self.snapshots[snapshot.group_name] = snapshot
+        return events
+
+    def discard(self, group_name):
+        self.snapshots.pop(group_name, None)
+
+    def load(self):
+        with open(self.path) as f:
+            data = json.load(f)
+        self.snapshots = {name: GroupSnapshot(name, snapshot['members'], snapshot['digest'])
+                          for name, snapshot in data['groups'].items()}
+
+    def save(self):
+        """
+        Writes the snapshots to disk, replacing the previous file atomically.
+        """
+        data = {'groups': {name: {'digest': snapshot.digest, 'members': sorted(snapshot.members)}
+                           for name, snapshot in self.snapshots.items()}}
+        write_json_atomically(self.path, data)
+
+    def __str__(self):
+        return '<SnapshotStore {} groups{}>'.format(len(self), ' at {}'.format(self.path) if self.path else '')
+    __repr__ = __str__
+
+
+class ChangeSet(object):
+    """
+    The MembershipEvents found by a ChangeFeed poll, along with the snapshots they lead to. Iterating over it gives
+    the events.
+    """
+    def __init__(self):
+        self.events = []
+        # (previous, new) GroupSnapshots, for each group that changed
+        self.snapshots = []
+
+    def __iter__(self):
+        return iter(self.events)
+
+    def __len__(self):
+        return len(self.events)
+
+    def __str__(self):
+        return '<ChangeSet {} events in {} groups>'.format(len(self.events), len(self.snapshots))
+    __repr__ = __str__
+
+
+class ChangeFeed(object):
+    """
+    Polls the direct members of a set of groups and reports what changed since the last committed poll.
+
+    Groups are fetched concurrently. A group whose membership digest hasn't changed is recognised without comparing
+    sets. The first poll of a group with no stored snapshot reports all its members as additions.
+
+    Polling doesn't change the store. Once the events from a poll have been applied downstream, pass its ChangeSet to
+    commit(); until then, each poll reports them again, so nothing is lost if applying them fails part way.
+    """
+    def __init__(self, grouper, groups, *, store=None, path=None, concurrency=4):
+        """
+        :param store: A SnapshotStore to keep snapshots in
+        :param path: If given (instead of store), snapshots are loaded from and saved to this file
+        """
+        assert store is None or path is None
+        self.grouper = grouper
+        self.groups = list(groups)
+        assert all(isinstance(group, Group) for group in self.groups)
+        self.store = store if store is not None else SnapshotStore(path)
+        self.concurrency = concurrency
+        self.errors = collections.OrderedDict()
+        self.polls = 0
+        self.unchanged = 0
+
+    async def _poll_group(self, group):
+        try:
+            # Bypasses the cache, which could otherwise hide a change for a while
+            members = await self.grouper._get_members(group, member_filter=MemberFilter.immediate)
+        except (GrouperException, aiohttp.ClientError, asyncio.TimeoutError) as e:
+            logger.warning("Couldn't poll members of %s: %s", group.name, e)
+            self.errors[group.name] = e
+            return None
+        # A subject can be listed more than once, so the digest is taken over the ids that will be stored
+        subject_ids = {sys.intern(s.id) for s in members if s.id}
+        digest = membership_digest(subject_ids)
+        previous = self.store.get(group.name)
+        if previous is not None and previous.digest == digest:
+            self.unchanged += 1
+            return None
+        return previous, GroupSnapshot(group.name, subject_ids, digest)
+
+    async def poll(self):
+        """
+        Fetches every group's members and returns a ChangeSet of what changed, without updating the stored
+        snapshots. Groups that couldn't be fetched are listed in `errors`.
+        """
+        self.errors.clear()
+        self.polls += 1
+        results = await bounded_gather((self._poll_group(group) for group in self.groups), self.concurrency)
+        changes = ChangeSet()
+        for result in results:
+            if result is not None:
+                changes.snapshots.append(result)
+                changes.events.extend(self.store.diff(result[1]))
+        return changes
+
+    def commit(self, changes):
+        """
+        Records a poll's ChangeSet as applied, updating and saving the stored snapshots. A group that has since
+        been committed from a later poll is left as it is.
+        """
+        for previous, snapshot in changes.snapshots:
+            if self.store.get(snapshot.group_name) is previous:
+                self.store.update(snapshot)
+        if self.store.path and (changes.snapshots or not os.path.exists(self.store.path)):
+            self.store.save()
+
+    def __str__(self):
+        return '<ChangeFeed {} groups, {} polls>'.format(len(self.groups), self.polls)
+    __repr__ = __str__
@@ -1,16 +1,20 @@
-import asyncio
+import collections
+import copy
+
 from aiogrouper.util import bool_to_tf
 from aiogrouper.enum import SaveMode
 
-__all__ = ['Stem', 'StemToSave']
+__all__ = ['Stem', 'StemToSave', 'RecursiveDeleteResult']
 
 
 class Stem:
+    __slots__ = ('_name', '_uuid', 'description', 'extension', 'display_extension', 'grouper', '__weakref__')
+
     def __init__(self, grouper, *, name=None, uuid=None,
                  description=None, extension=None, display_extension=None):
         assert name or uuid, "One of name and uuid must be provided"
-        self.name = name
-        self.uuid = uuid
+        self._name = name
+        self._uuid = uuid
         self.description = description
         self.extension = extension
         self.display_extension = display_extension
@@ -43,12 +47,59 @@ class Stem:
                    description=data.get('description'),
                    grouper=grouper)
 
-    @asyncio.coroutine
-    def save(self, **kwargs):
-        return (yield from self.grouper.save_stem(StemToSave(self, **kwargs)))
+    async def save(self, **kwargs):
+        return await self.grouper.save_stem(StemToSave(self, **kwargs))
+
+    # Read-only, as for Group
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def uuid(self):
+        return self._uuid
+
+    def renamed(self, name):
+        """
+        Returns a copy of this Stem with a different name.
+        """
+        stem = copy.copy(self)
+        stem._name = name
+        return stem
+
+    def _refresh(self, other):
+        """
+        Brings this Stem up to date from a newer copy of it, as Group._refresh does.
+        """
+        if (other.name, other.uuid) != (self._name, self._uuid):
+            return False
+        self.description, self.extension = other.description, other.extension
+        self.display_extension = other.display_extension
+        return True
+
+    @property
+    def key(self):
+        """
+        Its name, or its uuid if it doesn't have a name; as with Group.key, stems are compared and hashed by this.
+        """
+        return ('name', self.name) if self.name else ('uuid', self.uuid)
+
+    def __eq__(self, other):
+        if not isinstance(other, Stem):
+            return NotImplemented
+        return self.key == other.key
+
+    def __hash__(self):
+        return hash((Stem, self.key))
+
+    def __str__(self):
+        return '<Stem {}: {!r}>'.format(self.name or self.uuid, self.display_extension)
+    __repr__ = __str__
 
 
 class StemToSave(object):
+    __slots__ = ('stem', 'stem_lookup', 'save_mode', 'create_parent_stems_if_not_exist')
+
     def __init__(self, stem, *,
                  stem_lookup=None,
                  save_mode=SaveMode.insert_or_update,
@@ -65,3 +116,27 @@ class StemToSave(object):
             'saveMode': self.save_mode.value,
             'createParentStemsIfNotExist': bool_to_tf(self.create_parent_stems_if_not_exist),
         }
+
+
+class RecursiveDeleteResult(object):
+    """
+    The outcome of Grouper.recursive_delete: an ordered mapping from each group and stem found to its ResultCode.
+    Objects in a batch whose request failed outright have ResultCode.exception, and the exception in `errors`.
+    """
+    def __init__(self):
+        self.groups = collections.OrderedDict()
+        self.stems = collections.OrderedDict()
+        self.errors = collections.OrderedDict()
+
+    @property
+    def failed(self):
+        return [obj for results in (self.groups, self.stems)
+                for obj, result_code in results.items() if not result_code.is_success]
+
+    def __bool__(self):
+        return not self.failed
+
+    def __str__(self):
+        return '<RecursiveDeleteResult {} groups, {} stems, {} failed>'.format(len(self.groups), len(self.stems),
+                                                                           len(self.failed))
+    __repr__ = __str__
@@ -0,0 +1,240 @@
+import collections
+import time
+
+try:
+    import ijson
+except ImportError:  # pragma: no cover
+    ijson = None
+
+from .exceptions import api_exceptions, GrouperAPIException, GrouperDeserializeException
+from .group import Group
+from .stem import Stem
+from .subject import Subject
+
+__all__ = ['MembershipParser', 'MembershipStream']
+
+_tables = {'wsGroups': Group, 'wsStems': Stem, 'wsSubjects': Subject}
+_table_keys = {Group: 'uuid', Stem: 'uuid', Subject: 'id'}
+
+# ijson prefixes of the parts of the response we're interested in
+_results_prefix = 'WsGetMembershipsResults.'
+_item_prefixes = {_results_prefix + name + '.item': name for name in _tables}
+_item_prefixes[_results_prefix + 'resultMetadata'] = 'resultMetadata'
+_table_prefixes = frozenset(_results_prefix + name for name in _tables)
+_membership_item = _results_prefix + 'wsMemberships.item'
+_membership_subject = _membership_item + '.subjectId'
+_membership_group = _membership_item + '.groupId'
+_membership_stem = _membership_item + '.ownerStemId'
+
+
+class MembershipParser(object):
+    """
+    Turns a WsGetMembershipsResults response into (subject, owner) pairs, where owner is a Group or a Stem.
+
+    Memberships are reduced to (subjectId, owner kind, ownerId) as soon as they're read, and paired up with their
+    subject and owner once those have been seen. Body chunks are passed to feed(), and each call returns the pairs
+    that could be resolved so far. With ijson installed the body is parsed incrementally; without it, it's buffered
+    and decoded with the Grouper's codec when close() is called.
+    """
+    def __init__(self, grouper, *, method='post', path=None, input=None, incremental=None):
+        self.grouper = grouper
+        self.method, self.path, self.input = method, path, input
+        self.incremental = ijson is not None if incremental is None else incremental
+        self.tables = {Group: {}, Stem: {}, Subject: {}}
+        self.result_metadata = None
+        self.pair_count = 0
+        self._pending = []
+        self._ready = []
+        if self.incremental:
+            self._events = ijson.sendable_list()
+            self._parser = ijson.parse_coro(self._events)
+            self._builder = None
+            self._membership = [None, None, None]
+        else:
+            self._chunks = []
+
+    # Resolution
+
+    def _add_object(self, cls, data):
+        self.tables[cls][data[_table_keys[cls]]] = self.grouper._from_json(cls, data)
+
+    def _add_membership(self, membership):
+        """
+        :param membership: A (subjectId, Group or Stem, ownerId) tuple
+        """
+        if not self._resolve(membership):
+            self._pending.append(membership)
+
+    def _resolve(self, membership):
+        subject_id, owner_cls, owner_id = membership
+        subject = self.tables[Subject].get(subject_id)
+        owner = self.tables[owner_cls].get(owner_id)
+        if subject is None or owner is None:
+            return False
+        self._ready.append((subject, owner))
+        self.pair_count += 1
+        return True
+
+    def _sweep(self):
+        if self._pending:
+            self._pending = [membership for membership in self._pending if not self._resolve(membership)]
+
+    def _check_metadata(self, result_metadata, output=None):
+        self.result_metadata = result_metadata
+        if result_metadata.get('success') == 'F':
+            exc = api_exceptions.get(result_metadata.get('resultCode'), GrouperAPIException)
+            raise exc(result_metadata.get('resultMessage'), self.method, self.path, self.input, output)
+
+    def _take(self):
+        ready, self._ready = self._ready, []
+        return ready
+
+    # Input
+
+    def feed(self, chunk):
+        if not self.incremental:
+            self._chunks.append(chunk)
+            return []
+        self._parser.send(chunk)
+        self._handle_events()
+        return self._take()
+
+    def close(self):
+        """
+        Signals the end of the body, returning any remaining pairs.
+        """
+        if not self.incremental:
+            data = self.grouper.codec.loads(b''.join(self._chunks))
+            self._chunks = None
+            return self.parse(data)
+        self._parser.close()
+        self._handle_events()
+        return self._finish()
+
+    def parse(self, output):
+        """
+        Resolves an already-decoded response. The response is left as it is, as others (e.g. observers) may still
+        be holding it.
+        """
+        results_name, data = next(iter(output.items()))
+        self._check_metadata(data['resultMetadata'], output)
+        for name, cls in _tables.items():
+            for item in data.get(name) or ():
+                self._add_object(cls, item)
+        for membership in data.get('wsMemberships') or ():
+            if 'groupId' in membership:
+                self._add_membership((membership['subjectId'], Group, membership['groupId']))
+            else:
+                self._add_membership((membership['subjectId'], Stem, membership['ownerStemId']))
+        return self._finish()
+
+    def _finish(self):
+        self._sweep()
+        if self._pending:
+            raise GrouperDeserializeException("{} memberships refer to subjects or owners missing from the "
+                                              "response".format(len(self._pending)))
+        self.tables = None
+        return self._take()
+
+    def _handle_events(self):
+        # This runs for every JSON token, so memberships are picked out field by field rather than built as dicts
+        builder = self._builder
+        for prefix, event, value in self._events:
+            if builder is not None:
+                builder.event(event, value)
+                if event == 'end_map' and prefix == self._builder_prefix:
+                    self._item_done(self._builder_kind, builder.value)
+                    builder = None
+            elif prefix == _membership_subject:
+                self._membership[0] = value
+            elif prefix == _membership_group:
+                self._membership[1:] = Group, value
+            elif prefix == _membership_stem:
+                self._membership[1:] = Stem, value
+            elif prefix == _membership_item:
+                if event == 'start_map':
+                    self._membership = [None, None, None]
+                elif event == 'end_map':
+                    self._add_membership(tuple(self._membership))
+            elif event == 'start_map' and prefix in _item_prefixes:
+                builder = ijson.ObjectBuilder()
+                builder.event(event, value)
+                self._builder_prefix, self._builder_kind = prefix, _item_prefixes[prefix]
+            elif event == 'end_array' and prefix in _table_prefixes:
+                self._sweep()
+        self._builder = builder
+        del self._events[:]
+
+    def _item_done(self, kind, data):
+        if kind == 'resultMetadata':
+            self._check_metadata(data)
+        else:
+            self._add_object(_tables[kind], data)
+
+
+class MembershipStream(object):
+    """
+    An asynchronous iterator of (subject, owner) pairs, read from a get_memberships response as it arrives.
+
+    `open_response` is a coroutine function returning (response, release), where release(stream) is called with the
+    stream once the response is no longer needed. The stream's `response_bytes`, `parse_time` and `error` are
+    complete by then.
+    """
+    def __init__(self, parser, open_response, *, chunk_size=65536):
+        self.parser = parser
+        self._open_response = open_response
+        self.chunk_size = chunk_size
+        self.response_bytes = 0
+        self.parse_time = 0.0
+        self.error = None
+        self._response = self._release = None
+        self._ready = collections.deque()
+        # Without a request to make, there's nothing to iterate over
+        self._done = open_response is None
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while not self._ready:
+            if self._done:
+                raise StopAsyncIteration
+            try:
+                if self._response is None:
+                    self._response, self._release = await self._open_response()
+                chunk = await self._response.content.read(self.chunk_size)
+                start_time = time.monotonic()
+                try:
+                    if chunk:
+                        self.response_bytes += len(chunk)
+                        self._ready.extend(self.parser.feed(chunk))
+                    else:
+                        self._ready.extend(self.parser.close())
+                finally:
+                    self.parse_time += time.monotonic() - start_time
+                if not chunk:
+                    self.close()
+            except BaseException as e:
+                if isinstance(e, Exception):
+                    self.error = e
+                self.close()
+                raise
+        return self._ready.popleft()
+
+    def close(self):
+        self._done = True
+        if self._release is not None:
+            release, self._release = self._release, None
+            release(self)
+
+    async def aclose(self):
+        self.close()
+
+    async def collect(self):
+        """
+        Reads the rest of the stream into a dict mapping each subject to its set of groups and stems.
+        """
+        results = collections.defaultdict(set)
+        async for subject, owner in self:
+            results[subject].add(owner)
+        return dict(results)
@@ -1,18 +1,22 @@
 __all__ = ['Subject', 'everyone']
 
 class Subject:
+    __slots__ = ('_id', '_identifier', 'source', 'name', 'grouper', '__weakref__')
+
     def __init__(self, *, id=None, identifier=None, source=None, name=None, grouper=None):
         assert id or identifier
-        self.id = id
-        self.identifier, self.source = identifier, source
+        self._id = id
+        self._identifier, self.source = identifier, source
         self.name = name
         self.grouper = grouper
 
     @classmethod
     def from_json(cls, value, grouper=None):
         if isinstance(value, dict):
-            return cls(id=value['id'],
-                       identifier=value.get('identifierLookup'),
+            identifier = value.get('identifierLookup')
+            # Grouper reports unresolved identifier lookups with an id of 'None'
+            return cls(id=value['id'] if value['id'] != 'None' or not identifier else None,
+                       identifier=identifier,
                        source=value.get('sourceId'),
                        name=value.get('name'),
                        grouper=grouper)
@@ -36,6 +40,41 @@ class Subject:
         if self.name: data['name'] = self.name
         return data
 
+    # Read-only, as a Subject is hashed by them
+    @property
+    def id(self):
+        return self._id
+
+    @property
+    def identifier(self):
+        return self._identifier
+
+    def _refresh(self, other):
+        """
+        Brings this Subject up to date from a newer copy of it, returning False (and changing nothing) if the copy
+        has a different id.
+        """
+        if other.id != self._id:
+            return False
+        self.name = other.name
+        return True
+
+    @property
+    def key(self):
+        """
+        What a Subject is compared and hashed by: its id, or its identifier if it doesn't have one. Sources are often
+        left out of lookups, so they aren't compared; compare (source, id) explicitly where that matters.
+        """
+        return ('id', self.id) if self.id else ('identifier', self.identifier)
+
+    def __eq__(self, other):
+        if not isinstance(other, Subject):
+            return NotImplemented
+        return self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
     def __str__(self):
         return '<Subject {}: {!r}>'.format(self.id, self.name)
     __repr__ = __str__
@@ -0,0 +1,218 @@
+import asyncio
+import atexit
+import functools
+import inspect
+import os
+import threading
+
+import aiohttp
+
+from .grouper import Grouper
+
+__all__ = ['BackgroundLoop', 'SyncGrouper', 'SyncIterator']
+
+
+class BackgroundLoop(object):
+    """
+    An event loop running in a daemon thread, with one pooled aiohttp session, for calling Grouper from threaded code.
+
+    Coroutines are submitted from any thread with run(), which blocks until they complete. Everything that shares a
+    BackgroundLoop shares its keep-alive connections, and its has_member and get_subject_memberships coalescing. The
+    pool options are those of Grouper, and apply to the shared session.
+    """
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, *, pool_size=100, per_host_limit=0, keepalive_timeout=15, dns_cache_ttl=10):
+        self.pid = os.getpid()
+        self.loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run_forever, name='aiogrouper-loop', daemon=True)
+        self._thread.start()
+        self.session = self.run(self._create_session(pool_size, per_host_limit, keepalive_timeout, dns_cache_ttl))
+
+    @classmethod
+    def default(cls):
+        """
+        Returns the process-wide BackgroundLoop, starting it on first use.
+
+        A process forked after the loop was started (e.g. a pre-forking WSGI server's workers) gets a loop of its
+        own, as the thread doesn't survive the fork.
+        """
+        with cls._default_lock:
+            if cls._default is None or cls._default.pid != os.getpid():
+                cls._default = cls()
+                atexit.register(cls._default.close)
+            return cls._default
+
+    def _run_forever(self):
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+    async def _create_session(self, pool_size, per_host_limit, keepalive_timeout, dns_cache_ttl):
+        return aiohttp.ClientSession(connector=aiohttp.TCPConnector(
+            limit=pool_size,
+            limit_per_host=per_host_limit,
+            keepalive_timeout=keepalive_timeout,
+            use_dns_cache=bool(dns_cache_ttl),
+            ttl_dns_cache=dns_cache_ttl or None,
+        ))
+
+    @property
+    def running(self):
+        return self._thread.is_alive() and not self.loop.is_closed()
+
+    def run(self, coro, timeout=None):
+        """
+        Runs a coroutine on the loop and returns its result, blocking the calling thread until it's done.
+
+        :param timeout: Seconds to wait before cancelling the coroutine and raising concurrent.futures.TimeoutError
+        """
+        assert threading.current_thread() is not self._thread, "run() would deadlock when called from the loop"
+        future = asyncio.run_coroutine_threadsafe(coro, self.loop)
+        try:
+            return future.result(timeout)
+        except BaseException:
+            # Covers timeouts, and KeyboardInterrupt and the like in the calling thread
+            future.cancel()
+            raise
+
+    def close(self):
+        """
+        Closes the shared session and stops the loop's thread.
+        """
+        if not self.running:
+            return
+        if self.pid == os.getpid():
+            self.run(self.session.close())
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self._thread.join()
+        self.loop.close()
+
+    def __str__(self):
+        return '<BackgroundLoop pid {}{}>'.format(self.pid, '' if self.running else ', stopped')
+    __repr__ = __str__
+
+
+class SyncIterator(object):
+    """
+    A blocking iterator over one of Grouper's asynchronous iterators, crossing to the loop once per `batch_size`
+    items rather than once per item.
+    """
+    def __init__(self, background_loop, iterator, batch_size=1000):
+        self._background_loop = background_loop
+        self._iterator = iterator
+        self.batch_size = batch_size
+        self._items = []
+        self._position = 0
+        self._done = False
+
+    async def _take(self):
+        items = []
+        try:
+            while len(items) < self.batch_size:
+                items.append(await self._iterator.__anext__())
+        except StopAsyncIteration:
+            self._done = True
+        return items
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._position == len(self._items):
+            if self._done:
+                raise StopIteration
+            self._items, self._position = self._background_loop.run(self._take()), 0
+            if not self._items:
+                raise StopIteration
+        item = self._items[self._position]
+        self._position += 1
+        return item
+
+    def close(self):
+        """
+        Stops iterating, releasing the response or prefetched page behind the iterator.
+        """
+        if not self._done:
+            self._done = True
+            self._items, self._position = [], 0
+            self._background_loop.run(self._iterator.aclose())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+class SyncGrouper(object):
+    """
+    A blocking Grouper, for use from threads (e.g. the request handlers of a WSGI application).
+
+    Each coroutine method of Grouper has a blocking counterpart here with the same name and arguments, run on a
+    BackgroundLoop; the iter_ methods return SyncIterators. Other attributes are those of the underlying Grouper.
+    A SyncGrouper can be shared between threads, and is best created once per process.
+    """
+    def __init__(self, base_url, *, background_loop=None, iterator_batch_size=1000, **kwargs):
+        """
+        :param background_loop: The BackgroundLoop to run on; by default the process-wide one
+        :param kwargs: Passed on to Grouper. Without a session, the BackgroundLoop's shared session is used.
+        """
+        self.background_loop = background_loop or BackgroundLoop.default()
+        self.iterator_batch_size = iterator_batch_size
+        kwargs.setdefault('session', self.background_loop.session)
+        # Grouper's locks, limiters and coalescers belong with the loop they'll run on
+        self.grouper = self.background_loop.run(self._create_grouper(base_url, kwargs))
+
+    async def _create_grouper(self, base_url, kwargs):
+        return Grouper(base_url, **kwargs)
+
+    def run(self, coro, timeout=None):
+        """
+        Runs any coroutine (e.g. StemTree.refresh() or Group.save()) on the background loop, returning its result.
+        """
+        return self.background_loop.run(coro, timeout)
+
+    def close(self):
+        """
+        Closes the underlying Grouper's session, unless it is the one shared by the BackgroundLoop.
+        """
+        if self.grouper._session is not self.background_loop.session:
+            self.run(self.grouper.close())
+
+    def __getattr__(self, name):
+        if name == 'grouper':
+            raise AttributeError(name)
+        return getattr(self.grouper, name)
+
+    def __str__(self):
+        return '<SyncGrouper {}>'.format(self.grouper._base_url)
+    __repr__ = __str__
+
+
+def _blocking(name, method):
+    @functools.wraps(method)
+    def blocking(self, *args, **kwargs):
+        return self.background_loop.run(getattr(self.grouper, name)(*args, **kwargs))
+    return blocking
+
+
+def _iterating(name, method):
+    async def start(grouper, args, kwargs):
+        return getattr(grouper, name)(*args, **kwargs)
+
+    @functools.wraps(method)
+    def iterating(self, *args, **kwargs):
+        iterator = self.background_loop.run(start(self.grouper, args, kwargs))
+        return SyncIterator(self.background_loop, iterator, self.iterator_batch_size)
+    return iterating
+
+
+for _name, _method in vars(Grouper).items():
+    if _name.startswith('_') or hasattr(SyncGrouper, _name):
+        continue
+    if inspect.iscoroutinefunction(_method):
+        setattr(SyncGrouper, _name, _blocking(_name, _method))
+    elif _name.startswith('iter_'):
+        setattr(SyncGrouper, _name, _iterating(_name, _method))
+del _name, _method
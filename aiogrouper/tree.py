@@ -0,0 +1,189 @@
+import collections
+
+from .query import FindByParentStemName
+from .stem import Stem
+from .util import bounded_gather
+
+__all__ = ['StemTree']
+
+
+def _parent_name(name):
+    return name.rpartition(':')[0]
+
+
+class StemTree(object):
+    """
+    An in-memory index of the stems beneath (and including) a root stem.
+
+    The subtree is loaded a level at a time, with the children of each stem in a level fetched concurrently. Stems
+    can then be looked up by name or uuid, and their children, descendants and ancestors found without any further
+    requests. save_stems and delete_stems calls on the same Grouper are applied to the index as they complete;
+    changes they can't account for (such as parent stems created implicitly) mark the affected subtree as stale, to
+    be reloaded by refresh().
+    """
+    def __init__(self, grouper, root, *, concurrency=4):
+        assert isinstance(root, Stem) and root.name
+        self.grouper = grouper
+        self.root = root
+        self.concurrency = concurrency
+        self.stale = set()
+        self._by_name = {}
+        self._by_uuid = {}
+        self._children = collections.defaultdict(collections.OrderedDict)
+        grouper.stem_trees.add(self)
+
+    # Loading
+
+    async def load(self):
+        """
+        (Re)loads the whole subtree.
+        """
+        await self.refresh(self.root)
+        return self
+
+    async def refresh(self, stem=None):
+        """
+        Reloads the subtree beneath a stem, or if none is given, every subtree marked as stale.
+
+        Each subtree is swapped in once all of it has loaded, so until then (or if loading fails) the tree keeps
+        what it had.
+        """
+        names = [stem.name] if stem is not None else self._outermost(self.stale)
+        for name in names:
+            found = await self.grouper._find_stems(lookups=[Stem(self.grouper, name=name)])
+            subtree, level = found[:1], found[:1]
+            seen = {s.name for s in subtree}
+            while level:
+                results = await bounded_gather((self.grouper._find_stems(query=FindByParentStemName(s.name))
+                                                for s in level), self.concurrency)
+                level = [child for children in results for child in children if child.name not in seen]
+                seen.update(child.name for child in level)
+                subtree.extend(level)
+            self._remove(name)
+            for s in subtree:
+                self._add(s)
+            self.stale.difference_update(n for n in list(self.stale) if self._within(n, name))
+
+    def _outermost(self, names):
+        return [name for name in sorted(names) if not any(other != name and self._within(name, other)
+                                                          for other in names)]
+
+    # Index maintenance
+
+    def _within(self, name, ancestor):
+        return name == ancestor or name.startswith(ancestor + ':')
+
+    def _add(self, stem):
+        old = self._by_name.get(stem.name)
+        if old is not None and old.uuid:
+            self._by_uuid.pop(old.uuid, None)
+        self._by_name[stem.name] = stem
+        if stem.uuid:
+            self._by_uuid[stem.uuid] = stem
+        if stem.name != self.root.name:
+            self._children[_parent_name(stem.name)][stem.name] = None
+
+    def _remove(self, name):
+        """
+        Removes a stem and everything beneath it from the index.
+        """
+        for child in list(self._children.pop(name, ())):
+            self._remove(child)
+        stem = self._by_name.pop(name, None)
+        if stem is not None and stem.uuid:
+            self._by_uuid.pop(stem.uuid, None)
+        siblings = self._children.get(_parent_name(name))
+        if siblings is not None:
+            siblings.pop(name, None)
+
+    def _saved(self, old_name, stem):
+        """
+        Applies a successful save of a stem, previously called old_name, to the index.
+        """
+        old_name = old_name or getattr(self._by_uuid.get(stem.uuid), 'name', None)
+        if not (self._within(stem.name, self.root.name) or (old_name and self._within(old_name, self.root.name))):
+            return
+        if old_name and old_name != stem.name and old_name in self._by_name:
+            # Grouper renames everything beneath a renamed stem too
+            moved = [self._by_name[name] for name in self._subtree_names(old_name)]
+            self._remove(old_name)
+            if self._within(stem.name, self.root.name):
+                for descendant in moved[1:]:
+                    self._add(descendant.renamed(stem.name + descendant.name[len(old_name):]))
+        if not self._within(stem.name, self.root.name):
+            return
+        if stem.name == self.root.name or _parent_name(stem.name) in self._by_name:
+            self._add(stem)
+        else:
+            # Parents were created along the way; reload from the nearest one we know of
+            ancestor = _parent_name(stem.name)
+            while ancestor not in self._by_name and ancestor != self.root.name:
+                ancestor = _parent_name(ancestor)
+            self.stale.add(ancestor)
+
+    def _deleted(self, stem):
+        name = stem.name or getattr(self._by_uuid.get(stem.uuid), 'name', None)
+        if name and self._within(name, self.root.name):
+            self._remove(name)
+
+    def _subtree_names(self, name):
+        yield name
+        for child in self._children.get(name, ()):
+            yield from self._subtree_names(child)
+
+    # Queries
+
+    def get(self, name=None, *, uuid=None):
+        """
+        Returns the stem with the given name or uuid, or None if it isn't in the tree.
+        """
+        return self._by_name.get(name) if name is not None else self._by_uuid.get(uuid)
+
+    def __getitem__(self, name):
+        return self._by_name[name]
+
+    def __contains__(self, stem):
+        return (stem.name if isinstance(stem, Stem) else stem) in self._by_name
+
+    def __len__(self):
+        return len(self._by_name)
+
+    def __iter__(self):
+        return iter(self._by_name.values())
+
+    def _name(self, stem):
+        if isinstance(stem, Stem):
+            return stem.name or self._by_uuid[stem.uuid].name
+        return stem
+
+    def parent(self, stem):
+        name = self._name(stem)
+        return self._by_name.get(_parent_name(name)) if name != self.root.name else None
+
+    def children(self, stem):
+        return [self._by_name[name] for name in self._children.get(self._name(stem), ())]
+
+    def descendants(self, stem):
+        """
+        Every stem beneath the given one, parents before their children.
+        """
+        names = self._subtree_names(self._name(stem))
+        next(names)
+        return [self._by_name[name] for name in names]
+
+    def ancestors(self, stem):
+        """
+        The stems above the given one, nearest first, up to the root of the tree.
+        """
+        ancestors, name = [], self._name(stem)
+        while name != self.root.name:
+            name = _parent_name(name)
+            if name not in self._by_name:
+                break
+            ancestors.append(self._by_name[name])
+        return ancestors
+
+    def __str__(self):
+        return '<StemTree {}: {} stems{}>'.format(self.root.name, len(self),
+                                                   ', stale' if self.stale else '')
+    __repr__ = __str__
@@ -1,6 +1,63 @@
+import asyncio
+import json
+import os
+import tempfile
+
+
 def tf_to_bool(value):
     return value == 'T'
 
 def bool_to_tf(value):
     return 'T' if value else 'F'
 
+def chunks(items, size):
+    """
+    Splits a list into consecutive slices of at most `size` items. A falsy size means no splitting.
+    """
+    if not size or len(items) <= size:
+        return [items]
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+async def bounded_gather(coros, limit=None):
+    """
+    Like asyncio.gather, but runs at most `limit` of the given coroutines at once. Results are returned in order.
+
+    If one raises, those that haven't started yet are skipped, and the first exception is raised once those already
+    running have finished, so nothing is left running unobserved.
+    """
+    coros = list(coros)
+    semaphore = asyncio.Semaphore(limit) if limit and len(coros) > limit else None
+    errors = []
+
+    async def run(coro):
+        if errors:
+            coro.close()
+            return None
+        try:
+            return await coro
+        except Exception as e:
+            errors.append(e)
+            raise
+
+    async def run_bounded(coro):
+        async with semaphore:
+            return await run(coro)
+
+    results = await asyncio.gather(*[run(coro) if semaphore is None else run_bounded(coro) for coro in coros],
+                                   return_exceptions=True)
+    if errors:
+        raise errors[0]
+    return results
+
+def write_json_atomically(path, data):
+    """
+    Writes data to a JSON file, replacing any previous file atomically so that readers never see a partial write.
+    """
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, separators=(',', ':'))
+        os.replace(temp_path, path)
+    except BaseException:
+        os.unlink(temp_path)
+        raise
@@ -0,0 +1,5 @@
+"""
+Benchmarks for aiogrouper, run against an in-process fake of the Grouper WS.
+
+Run with ``python -m benchmarks --help``.
+"""
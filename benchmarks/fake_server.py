@@ -0,0 +1,312 @@
+import asyncio
+import collections
+import uuid
+
+from aiohttp import web
+
+__all__ = ['FakeGrouperServer']
+
+API_PATH = '/servicesRest/v2_2_000/'
+
+
+def _ok(results_name, **data):
+    data['resultMetadata'] = {'success': 'T', 'resultCode': 'SUCCESS'}
+    return {results_name: data}
+
+
+def _result(code='SUCCESS', success=True):
+    return {'success': 'T' if success else 'F', 'resultCode': code}
+
+
+class FakeGrouperServer(object):
+    """
+    An in-memory stand-in for the parts of the Grouper WS (servicesRest/v2_2_000) that aiogrouper uses.
+
+    Each response is delayed by `latency` seconds plus `latency_per_item` for every subject, group or stem in the
+    request. `subject_name_size` pads subject names, to control response payload sizes.
+    """
+    def __init__(self, *, latency=0.0, latency_per_item=0.0, subject_name_size=20, source='fake'):
+        self.latency = latency
+        self.latency_per_item = latency_per_item
+        self.subject_name_size = subject_name_size
+        self.source = source
+        self.stems = collections.OrderedDict()
+        self.groups = collections.OrderedDict()
+        self.members = collections.defaultdict(collections.OrderedDict)
+        self.requests = collections.Counter()
+        self._runner = None
+        self.port = None
+
+    # Data
+
+    def subject(self, subject_id):
+        return {'id': subject_id, 'sourceId': self.source,
+                'name': 'Subject {}'.format(subject_id).ljust(self.subject_name_size, '.')}
+
+    def add_stem(self, name):
+        for depth in range(1, name.count(':') + 2):
+            stem_name = ':'.join(name.split(':')[:depth])
+            if stem_name not in self.stems:
+                self.stems[stem_name] = {'name': stem_name, 'uuid': uuid.uuid4().hex,
+                                         'extension': stem_name.rsplit(':', 1)[-1],
+                                         'displayExtension': stem_name.rsplit(':', 1)[-1]}
+        return self.stems[name]
+
+    def add_group(self, name, members=()):
+        if ':' in name:
+            self.add_stem(name.rsplit(':', 1)[0])
+        group = self.groups.setdefault(name, {'name': name, 'uuid': uuid.uuid4().hex,
+                                              'extension': name.rsplit(':', 1)[-1],
+                                              'displayExtension': name.rsplit(':', 1)[-1]})
+        for subject_id in members:
+            self.members[name][subject_id] = True
+        return group
+
+    def populate(self, stem='bench', groups=10, members_per_group=100):
+        """
+        Creates `groups` groups beneath `stem`, each with `members_per_group` members drawn from a shared pool.
+        """
+        for i in range(groups):
+            self.add_group('{}:group{}'.format(stem, i),
+                           ('s{}'.format((i * members_per_group // 2 + j) % (groups * members_per_group))
+                            for j in range(members_per_group)))
+
+    def _find_group(self, lookup):
+        if lookup.get('groupName'):
+            return self.groups.get(lookup['groupName'])
+        for group in self.groups.values():
+            if group['uuid'] == lookup.get('uuid'):
+                return group
+
+    def _find_stem(self, lookup):
+        if lookup.get('stemName'):
+            return self.stems.get(lookup['stemName'])
+        for stem in self.stems.values():
+            if stem['uuid'] == lookup.get('uuid'):
+                return stem
+
+    @staticmethod
+    def _subject_id(lookup):
+        return lookup.get('subjectId') or lookup.get('subjectIdentifier')
+
+    @staticmethod
+    def _in_scope(name, parent, one_level):
+        if not name.startswith(parent + ':'):
+            return False
+        return not one_level or ':' not in name[len(parent) + 1:]
+
+    @staticmethod
+    def _page(items, query_filter):
+        if query_filter.get('pageSize'):
+            size, number = int(query_filter['pageSize']), int(query_filter.get('pageNumber', 1))
+            if query_filter.get('sortString'):
+                items = sorted(items, key=lambda item: item.get(query_filter['sortString'], ''),
+                               reverse=query_filter.get('ascending') == 'F')
+            return items[(number - 1) * size:number * size]
+        return items
+
+    # Request handlers, keyed by request type
+
+    def find_groups(self, request):
+        if 'wsGroupLookups' in request:
+            groups = [self._find_group(lookup) for lookup in request['wsGroupLookups']]
+            return _ok('WsFindGroupsResults', groupResults=[g for g in groups if g])
+        query_filter = request.get('wsQueryFilter', {})
+        groups = list(self.groups.values())
+        if query_filter.get('queryFilterType') == 'FIND_BY_STEM_NAME':
+            one_level = query_filter.get('stemNameScope') != 'ALL_IN_SUBTREE'
+            groups = [g for g in groups if self._in_scope(g['name'], query_filter['stemName'], one_level)]
+        return _ok('WsFindGroupsResults', groupResults=self._page(groups, query_filter))
+
+    def save_groups(self, request):
+        results = []
+        for to_save in request['wsGroupToSaves']:
+            lookup = to_save.get('wsGroupLookup', {})
+            existing = self._find_group(lookup)
+            name = to_save['wsGroup']['name']
+            if existing and existing['name'] != name:
+                self.groups.pop(existing['name'])
+                self.members[name] = self.members.pop(existing['name'], collections.OrderedDict())
+            group = self.add_group(name)
+            if existing:
+                group['uuid'] = existing['uuid']
+            if to_save['wsGroup'].get('displayExtension'):
+                group['displayExtension'] = to_save['wsGroup']['displayExtension']
+            results.append({'wsGroup': group, 'resultMetadata': _result()})
+        return _ok('WsGroupSaveResults', results=results)
+
+    def delete_groups(self, request):
+        results = []
+        for lookup in request['wsGroupLookups']:
+            group = self._find_group(lookup)
+            if group:
+                del self.groups[group['name']]
+                self.members.pop(group['name'], None)
+            results.append({'wsGroup': group or {'name': lookup.get('groupName'), 'uuid': lookup.get('uuid')},
+                            'resultMetadata': _result('SUCCESS' if group else 'SUCCESS_GROUP_NOT_FOUND')})
+        return _ok('WsGroupDeleteResults', results=results)
+
+    def find_stems(self, request):
+        if 'wsStemLookups' in request:
+            stems = [self._find_stem(lookup) for lookup in request['wsStemLookups']]
+            return _ok('WsFindStemsResults', stemResults=[s for s in stems if s])
+        query_filter = request.get('wsStemQueryFilter', {})
+        stems = list(self.stems.values())
+        if query_filter.get('stemQueryFilterType') == 'FIND_BY_PARENT_STEM_NAME':
+            one_level = query_filter.get('parentStemNameScope') != 'ALL_IN_SUBTREE'
+            stems = [s for s in stems if self._in_scope(s['name'], query_filter['parentStemName'], one_level)]
+        return _ok('WsFindStemsResults', stemResults=self._page(stems, query_filter))
+
+    def save_stems(self, request):
+        results = []
+        for to_save in request['wsStemToSaves']:
+            stem = self.add_stem(to_save['wsStem']['name'])
+            results.append({'wsStem': stem, 'resultMetadata': _result()})
+        return _ok('WsStemSaveResults', results=results)
+
+    def delete_stems(self, request):
+        results = []
+        for lookup in request['wsStemLookups']:
+            stem = self._find_stem(lookup)
+            if stem:
+                del self.stems[stem['name']]
+            results.append({'wsStem': stem or {'name': lookup.get('stemName'), 'uuid': lookup.get('uuid')},
+                            'resultMetadata': _result('SUCCESS' if stem else 'SUCCESS_STEM_NOT_FOUND')})
+        return _ok('WsStemDeleteResults', results=results)
+
+    def get_members(self, group_name, query):
+        members = list(self.members.get(group_name, ()))
+        if query.get('sortString') == 'subjectId':
+            members.sort(reverse=query.get('ascending') == 'F')
+        members = self._page(members, {key: value for key, value in query.items() if key != 'sortString'})
+        return _ok('WsGetMembersLiteResult', wsSubjects=[self.subject(subject_id) for subject_id in members])
+
+    def add_members(self, group_name, request):
+        members = self.members[group_name]
+        if request.get('replaceAllExisting') == 'T':
+            members.clear()
+        results = []
+        for lookup in request['subjectLookups']:
+            subject_id = self._subject_id(lookup)
+            code = 'SUCCESS_ALREADY_EXISTED' if subject_id in members else 'SUCCESS'
+            members[subject_id] = True
+            results.append({'wsSubject': self.subject(subject_id), 'resultMetadata': _result(code)})
+        return _ok('WsAddMemberResults', results=results)
+
+    def delete_members(self, group_name, request):
+        members = self.members[group_name]
+        results = []
+        for lookup in request['subjectLookups']:
+            subject_id = self._subject_id(lookup)
+            code = 'SUCCESS' if members.pop(subject_id, None) else 'SUCCESS_WASNT_IMMEDIATE'
+            results.append({'wsSubject': self.subject(subject_id), 'resultMetadata': _result(code)})
+        return _ok('WsDeleteMemberResults', results=results)
+
+    def has_members(self, group_name, request):
+        members = self.members.get(group_name, {})
+        return _ok('WsHasMemberResults', results=[
+            {'wsSubject': self.subject(self._subject_id(lookup)),
+             'resultMetadata': _result(success=self._subject_id(lookup) in members)}
+            for lookup in request['subjectLookups']])
+
+    def get_memberships(self, request):
+        subject_ids = {self._subject_id(lookup) for lookup in request['wsSubjectLookups']}
+        if 'wsGroupLookups' in request:
+            groups = [g for g in (self._find_group(lookup) for lookup in request['wsGroupLookups']) if g]
+        elif 'wsStemLookup' in request:
+            one_level = request.get('stemScope') == 'ONE_LEVEL'
+            groups = [g for g in self.groups.values()
+                      if self._in_scope(g['name'], request['wsStemLookup']['stemName'], one_level)]
+        else:
+            groups = list(self.groups.values())
+        memberships, seen_groups, seen_subjects = [], {}, set()
+        for group in groups:
+            for subject_id in subject_ids.intersection(self.members.get(group['name'], ())):
+                memberships.append({'groupId': group['uuid'], 'subjectId': subject_id})
+                seen_groups[group['uuid']] = group
+                seen_subjects.add(subject_id)
+        return _ok('WsGetMembershipsResults',
+                   wsGroups=list(seen_groups.values()),
+                   wsSubjects=[self.subject(subject_id) for subject_id in sorted(seen_subjects)],
+                   wsMemberships=memberships)
+
+    def get_privileges(self, request):
+        return _ok('WsGetGrouperPrivilegesLiteResult', privilegeResults=[])
+
+    def assign_privileges(self, request):
+        return _ok('WsAssignGrouperPrivilegesResults', results=[])
+
+    _handlers = {
+        'WsRestFindGroupsRequest': find_groups,
+        'WsRestGroupSaveRequest': save_groups,
+        'WsRestGroupDeleteRequest': delete_groups,
+        'WsRestFindStemsRequest': find_stems,
+        'WsRestStemSaveRequest': save_stems,
+        'WsRestStemDeleteRequest': delete_stems,
+        'WsRestGetMembershipsRequest': get_memberships,
+        'WsRestGetGrouperPrivilegesLiteRequest': get_privileges,
+        'WsRestAssignGrouperPrivilegesRequest': assign_privileges,
+    }
+
+    _member_handlers = {
+        'WsRestAddMemberRequest': add_members,
+        'WsRestDeleteMemberRequest': delete_members,
+        'WsRestHasMemberRequest': has_members,
+    }
+
+    # HTTP
+
+    @staticmethod
+    def _size(request):
+        return max((len(value) for value in request.values() if isinstance(value, list)), default=1)
+
+    async def _delay(self, items):
+        delay = self.latency + self.latency_per_item * items
+        if delay:
+            await asyncio.sleep(delay)
+
+    async def handle(self, request):
+        body = await request.json()
+        request_name, data = next(iter(body.items()))
+        self.requests[request_name] += 1
+        await self._delay(self._size(data))
+        return web.json_response(self._handlers[request_name](self, data))
+
+    async def handle_members(self, request):
+        group_name = request.match_info['group']
+        if request.method == 'GET':
+            self.requests['WsRestGetMembersLiteRequest'] += 1
+            response = self.get_members(group_name, request.query)
+            await self._delay(len(next(iter(response.values()))['wsSubjects']))
+            return web.json_response(response)
+        body = await request.json()
+        request_name, data = next(iter(body.items()))
+        self.requests[request_name] += 1
+        await self._delay(self._size(data))
+        return web.json_response(self._member_handlers[request_name](self, group_name, data))
+
+    def make_app(self):
+        app = web.Application(client_max_size=1024 ** 3)
+        app.router.add_route('GET', API_PATH + 'groups/{group}/members', self.handle_members)
+        app.router.add_route('PUT', API_PATH + 'groups/{group}/members', self.handle_members)
+        app.router.add_route('POST', API_PATH + 'groups/{group}/members', self.handle_members)
+        for resource in ('groups', 'stems', 'memberships', 'grouperPrivileges'):
+            app.router.add_route('POST', API_PATH + resource, self.handle)
+            app.router.add_route('PUT', API_PATH + resource, self.handle)
+        return app
+
+    async def start(self, host='127.0.0.1', port=0):
+        """
+        Starts serving, and returns the base URL to pass to aiogrouper.Grouper.
+        """
+        self._runner = web.AppRunner(self.make_app(), access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+        return 'http://{}:{}/'.format(host, self.port)
+
+    async def stop(self):
+        if self._runner:
+            await self._runner.cleanup()
+            self._runner = None
@@ -0,0 +1,234 @@
+import argparse
+import asyncio
+import itertools
+import json
+import sys
+import time
+import tracemalloc
+
+import aiohttp
+
+from aiogrouper import Grouper, Group, Subject, FindByStemName
+
+from .fake_server import FakeGrouperServer
+
+__all__ = ['BenchmarkResult', 'measure', 'benchmarks', 'main']
+
+
+class BenchmarkResult(object):
+    def __init__(self, name, params, latencies, duration, peak_memory=None):
+        self.name, self.params = name, params
+        self.latencies = sorted(latencies)
+        self.duration = duration
+        self.peak_memory = peak_memory
+
+    @property
+    def ops_per_second(self):
+        return len(self.latencies) / self.duration if self.duration else 0.0
+
+    def percentile(self, q):
+        if not self.latencies:
+            return None
+        return self.latencies[min(len(self.latencies) - 1, int(q * len(self.latencies)))]
+
+    def to_dict(self):
+        return {'name': self.name, 'params': self.params, 'ops': len(self.latencies),
+                'ops_per_second': self.ops_per_second,
+                'p50': self.percentile(.5), 'p99': self.percentile(.99),
+                'peak_memory': self.peak_memory}
+
+    def __str__(self):
+        params = ' '.join('{}={}'.format(k, v) for k, v in sorted(self.params.items()))
+        memory = '{:8.1f}MiB'.format(self.peak_memory / 2 ** 20) if self.peak_memory is not None else ''
+        return '{:<16} {:<40} {:>10.1f} ops/s  p50 {:>8.2f}ms  p99 {:>8.2f}ms  {}'.format(
+            self.name, params, self.ops_per_second, self.percentile(.5) * 1000, self.percentile(.99) * 1000, memory)
+
+
+async def measure(name, params, operation, *, iterations, concurrency, memory=False):
+    """
+    Calls `operation(i)` for i in range(iterations), with up to `concurrency` calls in flight at once.
+    """
+    latencies, counter = [], itertools.count()
+
+    async def worker():
+        for i in counter:
+            if i >= iterations:
+                return
+            start = time.perf_counter()
+            await operation(i)
+            latencies.append(time.perf_counter() - start)
+
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+        duration = time.perf_counter() - start
+        peak_memory = tracemalloc.get_traced_memory()[1] if memory else None
+    finally:
+        if memory:
+            tracemalloc.stop()
+    return BenchmarkResult(name, dict(params, concurrency=concurrency), latencies, duration, peak_memory)
+
+
+def _subjects(prefix, count):
+    return [Subject(id='{}{}'.format(prefix, i)) for i in range(count)]
+
+
+async def bench_add_members(server, grouper, options, concurrency):
+    results = []
+    for size, chunk in itertools.product(options.sizes, options.chunks):
+        grouper.member_batch_size = chunk
+
+        async def operation(i):
+            group = Group(grouper, name='bench:add{}-{}-{}'.format(size, chunk, i))
+            server.add_group(group.name)
+            await grouper.add_members(group, _subjects('a', size))
+
+        results.append(await measure('add_members', {'size': size, 'chunk': chunk}, operation,
+                                     iterations=options.iterations, concurrency=concurrency,
+                                     memory=options.memory))
+    return results
+
+
+async def bench_get_members(server, grouper, options, concurrency):
+    results = []
+    for size in options.sizes:
+        group = Group(grouper, name='bench:get{}'.format(size))
+        server.add_group(group.name, ('g{}'.format(i) for i in range(size)))
+
+        async def operation(i):
+            await grouper.get_members(group)
+
+        results.append(await measure('get_members', {'size': size}, operation,
+                                     iterations=options.iterations, concurrency=concurrency,
+                                     memory=options.memory))
+    return results
+
+
+async def bench_get_memberships(server, grouper, options, concurrency):
+    results = []
+    for size in options.sizes:
+        subjects = _subjects('s', size)
+
+        async def operation(i):
+            await grouper.get_memberships(subjects)
+
+        results.append(await measure('get_memberships', {'size': size}, operation,
+                                     iterations=options.iterations, concurrency=concurrency,
+                                     memory=options.memory))
+    return results
+
+
+async def bench_has_member(server, grouper, options, concurrency):
+    group = Group(grouper, name='bench:group0')
+    results = []
+    for window in (None, 0.002):
+        grouper_kwargs = {'has_member_window': window} if window is not None else {}
+        coalescing = Grouper(grouper._base_url, session=grouper._session, **grouper_kwargs)
+
+        async def operation(i):
+            await coalescing.has_member(group, Subject(id='s{}'.format(i % 1000)))
+
+        result = await measure('has_member', {'window': window}, operation,
+                               iterations=options.iterations * 10, concurrency=concurrency,
+                               memory=options.memory)
+        if coalescing.has_member_coalescer:
+            result.params['batches'] = coalescing.has_member_coalescer.batches
+        results.append(result)
+    return results
+
+
+async def bench_find_groups(server, grouper, options, concurrency):
+    results = []
+    for size in options.sizes:
+        groups = [Group(grouper, name='bench:group{}'.format(i)) for i in range(min(size, options.groups))]
+
+        async def operation(i):
+            await grouper.find_groups(groups=groups)
+
+        results.append(await measure('find_groups', {'size': len(groups)}, operation,
+                                     iterations=options.iterations, concurrency=concurrency,
+                                     memory=options.memory))
+
+    async def operation(i):
+        await grouper.find_groups(query=FindByStemName('bench', recursive=True))
+
+    results.append(await measure('find_groups', {'query': 'bench'}, operation,
+                                 iterations=options.iterations, concurrency=concurrency,
+                                 memory=options.memory))
+    return results
+
+
+async def bench_save_groups(server, grouper, options, concurrency):
+    results = []
+    for size in options.sizes:
+        async def operation(i):
+            await grouper.save_groups([Group(grouper, name='bench:save:g{}-{}'.format(i, j))
+                                       for j in range(size)])
+
+        results.append(await measure('save_groups', {'size': size}, operation,
+                                     iterations=options.iterations, concurrency=concurrency,
+                                     memory=options.memory))
+    return results
+
+
+benchmarks = {
+    'add_members': bench_add_members,
+    'get_members': bench_get_members,
+    'get_memberships': bench_get_memberships,
+    'has_member': bench_has_member,
+    'find_groups': bench_find_groups,
+    'save_groups': bench_save_groups,
+}
+
+
+async def run(options):
+    server = FakeGrouperServer(latency=options.latency, latency_per_item=options.latency_per_item,
+                               subject_name_size=options.subject_name_size)
+    server.populate(groups=options.groups, members_per_group=options.members_per_group)
+    base_url = await server.start()
+    session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=max(options.concurrency)))
+    results = []
+    try:
+        for name in options.only or sorted(benchmarks):
+            for concurrency in options.concurrency:
+                grouper = Grouper(base_url, session=session)
+                for result in await benchmarks[name](server, grouper, options, concurrency):
+                    results.append(result)
+                    if not options.json:
+                        print(result)
+                        sys.stdout.flush()
+    finally:
+        await session.close()
+        await server.stop()
+    return results
+
+
+def _ints(value):
+    return [int(v) for v in value.split(',')]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description="Benchmark aiogrouper against a local fake Grouper WS.")
+    parser.add_argument('--only', action='append', choices=sorted(benchmarks),
+                        help="Run only this benchmark; may be repeated")
+    parser.add_argument('--iterations', type=int, default=20, help="Calls per benchmark (default: %(default)s)")
+    parser.add_argument('--concurrency', type=_ints, default=[1, 10], help="Comma-separated concurrency levels")
+    parser.add_argument('--sizes', type=_ints, default=[10, 1000], help="Comma-separated batch sizes")
+    parser.add_argument('--chunks', type=_ints, default=[1000], help="Comma-separated add_members chunk sizes")
+    parser.add_argument('--latency', type=float, default=0.0, help="Fake server latency per request, in seconds")
+    parser.add_argument('--latency-per-item', type=float, default=0.0,
+                        help="Extra fake server latency per item in a request, in seconds")
+    parser.add_argument('--subject-name-size', type=int, default=20, help="Padding for subject names")
+    parser.add_argument('--groups', type=int, default=100, help="Groups to create beneath bench:")
+    parser.add_argument('--members-per-group', type=int, default=100)
+    parser.add_argument('--memory', action='store_true', help="Track peak memory (slows things down)")
+    parser.add_argument('--json', action='store_true', help="Print results as JSON")
+    options = parser.parse_args(argv)
+    results = asyncio.run(run(options))
+    if options.json:
+        json.dump([result.to_dict() for result in results], sys.stdout, indent=2)
+        print()
+    return results
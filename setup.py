@@ -10,7 +10,13 @@ setup(
     author='University of Oxford',
     author_email='github@it.ox.ac.uk',
     license='BSD',
-    packages=find_packages(),
+    packages=find_packages(exclude=['benchmarks', 'benchmarks.*', 'tests', 'tests.*']),
+    python_requires='>=3.8',
     install_required=['aiohttp'],
+    entry_points={
+        'console_scripts': [
+            'aiogrouper-load-members = aiogrouper.loader:main',
+        ],
+    },
 )
     
@@ -0,0 +1,68 @@
+import asyncio
+import unittest
+
+from aiogrouper import Cache, Grouper, Group, Subject
+from benchmarks.fake_server import FakeGrouperServer
+
+
+class CacheTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = FakeGrouperServer()
+        self.server.add_group('test:group', ['a'])
+        self.server.add_group('test:other')
+        self.cache = Cache()
+        self.grouper = Grouper(await self.server.start(), cache=self.cache)
+        self.group = Group(self.grouper, name='test:group')
+
+    async def asyncTearDown(self):
+        await self.grouper.close()
+        await self.server.stop()
+
+    @property
+    def member_requests(self):
+        return self.server.requests['WsRestGetMembersLiteRequest']
+
+    async def test_get_members_is_cached(self):
+        await self.grouper.get_members(self.group)
+        members = await self.grouper.get_members(self.group)
+        self.assertEqual([s.id for s in members], ['a'])
+        self.assertEqual(self.member_requests, 1)
+
+    async def test_read_in_flight_during_a_write_isnt_cached(self):
+        self.server.latency = 0.1
+        read = asyncio.ensure_future(self.grouper.get_members(self.group))
+        await asyncio.sleep(0.05)
+        self.server.latency = 0
+        await self.grouper.add_members(self.group, [Subject(id='b')])
+        self.assertEqual([s.id for s in await read], ['a'])
+        members = await self.grouper.get_members(self.group)
+        self.assertEqual([s.id for s in members], ['a', 'b'])
+
+    async def test_lookup_in_flight_during_a_delete_isnt_cached(self):
+        self.server.latency = 0.1
+        lookup = asyncio.ensure_future(self.grouper.find_groups(groups=[self.group]))
+        await asyncio.sleep(0.05)
+        self.server.latency = 0
+        await self.grouper.delete_groups([Group(self.grouper, name='test:group')])
+        # Answered after the delete, as if it had been read before
+        self.server.add_group('test:group')
+        self.assertEqual(len(await lookup), 1)
+        await self.grouper.find_groups(groups=[self.group])
+        self.assertEqual(self.server.requests['WsRestFindGroupsRequest'], 2)
+
+    async def test_groups_by_uuid_are_cached_separately(self):
+        await self.grouper.get_members(Group(self.grouper, uuid='1'))
+        await self.grouper.get_members(Group(self.grouper, uuid='2'))
+        self.assertEqual(self.member_requests, 2)
+
+    async def test_member_changes_invalidate_other_groups(self):
+        # Another group's members, with Grouper's default filter, include those of groups within it
+        other = Group(self.grouper, name='test:other')
+        await self.grouper.get_members(other)
+        await self.grouper.add_members(self.group, [Subject(id='b')])
+        await self.grouper.get_members(other)
+        self.assertEqual(self.member_requests, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,53 @@
+import asyncio
+import unittest
+
+from aiogrouper import Coalescer, Grouper, Group, Subject
+from aiogrouper.exceptions import GrouperException
+from benchmarks.fake_server import FakeGrouperServer
+
+
+class CoalescerTestCase(unittest.IsolatedAsyncioTestCase):
+    async def test_repeated_items_are_sent_once(self):
+        batches = []
+
+        async def fetch(key, items):
+            batches.append(items)
+            return {item: item * 10 for item in items}
+
+        coalescer = Coalescer(fetch, window=0.01)
+        results = await asyncio.wait_for(asyncio.gather(*[coalescer.submit('k', item) for item in (1, 1, 2)]), 1)
+        self.assertEqual(results, [10, 10, 20])
+        self.assertEqual(batches, [[1, 2]])
+
+    async def test_missing_results_fail(self):
+        async def fetch(key, items):
+            return {items[0]: True}
+
+        coalescer = Coalescer(fetch, window=0.01)
+        results = await asyncio.wait_for(asyncio.gather(coalescer.submit('k', 'a'), coalescer.submit('k', 'b'),
+                                                        return_exceptions=True), 1)
+        self.assertIs(results[0], True)
+        self.assertIsInstance(results[1], GrouperException)
+
+
+class HasMemberCoalescingTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = FakeGrouperServer()
+        self.server.add_group('test:group', ['x'])
+        self.grouper = Grouper(await self.server.start(), has_member_window=0.01)
+
+    async def asyncTearDown(self):
+        await self.grouper.close()
+        await self.server.stop()
+
+    async def test_duplicate_subjects(self):
+        group = Group(self.grouper, name='test:group')
+        subjects = [Subject(id='x'), Subject(id='x'), Subject(id='y')]
+        results = await asyncio.wait_for(asyncio.gather(*[self.grouper.has_member(group, subject)
+                                                          for subject in subjects]), 5)
+        self.assertEqual(results, [True, True, False])
+        self.assertEqual(self.grouper.has_member_coalescer.batches, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
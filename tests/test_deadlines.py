@@ -0,0 +1,46 @@
+import asyncio
+import unittest
+
+from aiogrouper import AdaptiveConcurrencyLimiter, CircuitBreaker, Grouper, Group
+from aiogrouper.exceptions import GrouperCircuitOpenException, GrouperTimeoutException
+from benchmarks.fake_server import FakeGrouperServer
+
+
+class DeadlineTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = FakeGrouperServer(latency=1.0)
+        self.server.add_group('test:group')
+        self.limiter = AdaptiveConcurrencyLimiter(initial_limit=10, target_latency=0.01)
+        self.circuit_breaker = CircuitBreaker(failure_threshold=2)
+        self.grouper = Grouper(await self.server.start(), timeout=0.05, limiter=self.limiter,
+                               circuit_breaker=self.circuit_breaker)
+        self.group = Group(self.grouper, name='test:group')
+
+    async def asyncTearDown(self):
+        await self.grouper.close()
+        await self.server.stop()
+
+    async def test_timeouts_trip_the_circuit_breaker(self):
+        for _ in range(2):
+            with self.assertRaises(GrouperTimeoutException):
+                await self.grouper.find_groups(groups=[self.group])
+        self.assertEqual(self.circuit_breaker.state, CircuitBreaker.open)
+        with self.assertRaises(GrouperCircuitOpenException):
+            await self.grouper.find_groups(groups=[self.group])
+
+    async def test_timeouts_cut_the_limit(self):
+        with self.assertRaises(GrouperTimeoutException):
+            await self.grouper.find_groups(groups=[self.group])
+        self.assertEqual(self.limiter.decreases, 1)
+        self.assertLess(self.limiter.limit, 10)
+        self.assertEqual(self.limiter.in_flight, 0)
+
+    async def test_cancellation_is_not_a_failure(self):
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(self.grouper.find_groups(groups=[self.group], timeout=0), 0.05)
+        self.assertEqual(self.circuit_breaker.failures, 0)
+        self.assertEqual(self.limiter.decreases, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,66 @@
+import unittest
+
+from aiogrouper import Grouper, Group, Stem, Subject
+from benchmarks.fake_server import FakeGrouperServer
+
+
+class EqualityTestCase(unittest.TestCase):
+    def test_group_equality_is_symmetric_and_consistent_with_hash(self):
+        for cls in (Group, Stem):
+            by_uuid, by_both = cls(None, uuid='U'), cls(None, name='a:b', uuid='U')
+            self.assertEqual(by_uuid == by_both, by_both == by_uuid)
+            self.assertEqual(by_both, cls(None, name='a:b'))
+            self.assertEqual(hash(by_both), hash(cls(None, name='a:b', uuid='V')))
+
+    def test_subject_equality_is_transitive(self):
+        a, b, c = Subject(id='x', source='s1'), Subject(id='x'), Subject(id='x', source='s2')
+        self.assertEqual(a == b and b == c, a == c)
+        self.assertEqual(len({a, b, c}), 1)
+        self.assertNotEqual(Subject(id='x'), Subject(identifier='x'))
+
+    def test_keys_are_read_only(self):
+        for obj, attrs in ((Group(None, name='a:b'), ('name', 'uuid')), (Stem(None, name='a'), ('name', 'uuid')),
+                           (Subject(id='x'), ('id', 'identifier'))):
+            for attr in attrs:
+                with self.assertRaises(AttributeError):
+                    setattr(obj, attr, 'y')
+
+    def test_renamed(self):
+        group = Group(None, name='a:b', uuid='U', display_extension='B')
+        renamed = group.renamed('a:c')
+        self.assertEqual((renamed.name, renamed.uuid, renamed.display_extension), ('a:c', 'U', 'B'))
+        self.assertEqual(group.name, 'a:b')
+
+
+class IdentityMapTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = FakeGrouperServer()
+        self.data = self.server.add_group('test:group')
+        self.grouper = Grouper(await self.server.start(), intern=True)
+        self.group = Group(self.grouper, name='test:group')
+
+    async def asyncTearDown(self):
+        await self.grouper.close()
+        await self.server.stop()
+
+    async def test_interned_objects_are_updated(self):
+        first, = await self.grouper.find_groups(groups=[self.group])
+        self.data['displayExtension'] = 'Changed'
+        second, = await self.grouper.find_groups(groups=[self.group])
+        self.assertIs(first, second)
+        self.assertEqual(first.display_extension, 'Changed')
+
+    async def test_renamed_objects_are_replaced(self):
+        first, = await self.grouper.find_groups(groups=[self.group])
+        groups = {first}
+        del self.server.groups['test:group']
+        self.data['name'] = 'test:renamed'
+        self.server.groups['test:renamed'] = self.data
+        second, = await self.grouper.find_groups(groups=[Group(self.grouper, name='test:renamed')])
+        self.assertIsNot(first, second)
+        self.assertEqual((first.name, second.name), ('test:group', 'test:renamed'))
+        self.assertIn(first, groups)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import json
+import os
+import tempfile
+import unittest
+
+from aiohttp import web
+
+from aiogrouper import Grouper, MembershipLoader
+from benchmarks.fake_server import FakeGrouperServer
+
+FEED = ''.join('{},{}\n'.format(group, subject_id) for group, subject_id in [
+    ('test:a', '1'), ('test:a', '2'), ('test:b', '3'), ('test:c', '4'), ('test:d', '5')])
+
+
+class FailingServer(FakeGrouperServer):
+    failing = set()
+
+    def add_members(self, group_name, request):
+        if group_name in self.failing:
+            raise web.HTTPServiceUnavailable()
+        return super().add_members(group_name, request)
+
+    _member_handlers = dict(FakeGrouperServer._member_handlers, WsRestAddMemberRequest=add_members)
+
+
+class MembershipLoaderTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = FailingServer()
+        for group_name in ('test:a', 'test:b', 'test:c', 'test:d'):
+            self.server.add_group(group_name)
+        self.grouper = Grouper(await self.server.start())
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'feed.csv')
+        with open(self.path, 'w') as f:
+            f.write(FEED)
+        self.checkpoint = os.path.join(self.directory.name, 'checkpoint.json')
+
+    async def asyncTearDown(self):
+        await self.grouper.close()
+        await self.server.stop()
+        self.directory.cleanup()
+
+    def loader(self):
+        return MembershipLoader(self.grouper, concurrency=2, checkpoint=self.checkpoint)
+
+    def checkpoint_offset(self):
+        with open(self.checkpoint) as f:
+            return json.load(f)['offset']
+
+    async def test_resumes_from_the_first_failed_group(self):
+        self.server.failing = {'test:b'}
+        summary = await self.loader().load(self.path)
+        self.assertEqual(list(summary.failed), ['test:b'])
+        self.assertEqual((summary.groups, summary.rows, summary.added), (4, 5, 4))
+        self.assertEqual(list(self.server.members['test:d']), ['5'])
+        # Later groups were loaded, but the checkpoint stops short of the failed one
+        self.assertEqual(self.checkpoint_offset(), len('test:a,1\ntest:a,2\n'))
+
+        self.server.failing = set()
+        summary = await self.loader().load(self.path)
+        self.assertEqual(summary.resumed_from, len('test:a,1\ntest:a,2\n'))
+        self.assertEqual((summary.groups, summary.added, summary.unchanged), (3, 1, 2))
+        self.assertEqual(list(self.server.members['test:b']), ['3'])
+        self.assertEqual(self.checkpoint_offset(), len(FEED))
+
+    async def test_checkpoint_for_another_feed_is_ignored(self):
+        await self.loader().load(self.path)
+        with open(self.path, 'w') as f:
+            f.write(FEED.replace('5', '6'))
+        with self.assertLogs('aiogrouper', 'WARNING'):
+            summary = await self.loader().load(self.path)
+        self.assertEqual((summary.resumed_from, summary.groups), (0, 4))
+        self.assertEqual(list(self.server.members['test:d']), ['6'])
+
+
+if __name__ == '__main__':
+    unittest.main()
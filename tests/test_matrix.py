@@ -0,0 +1,49 @@
+import unittest
+
+from aiogrouper import Grouper, Group, MembershipMatrix, Subject
+from aiogrouper.exceptions import GrouperTimeoutException
+from benchmarks.fake_server import FakeGrouperServer
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class MembershipMatrixTestCase(unittest.TestCase):
+    def setUp(self):
+        self.matrix = MembershipMatrix.from_pairs([('a', 'x'), ('b', 'x'), ('b', 'y')], subjects=['c'])
+
+    def test_lookups_by_object_and_index(self):
+        self.assertEqual(list(self.matrix.owners_of('b')), [0, 1])
+        self.assertEqual(list(self.matrix.owners_of(self.matrix.subject_index['b'])), [0, 1])
+        self.assertEqual(list(self.matrix.subjects_of('y')), [self.matrix.subject_index['b']])
+        self.assertEqual(list(self.matrix.owners_of('c')), [])
+
+    @unittest.skipIf(numpy is None, "NumPy isn't installed")
+    def test_lookups_by_numpy_index(self):
+        for subject in self.matrix.members_of_all('x', 'y'):
+            self.assertIsInstance(subject, numpy.integer)
+            self.assertEqual(list(self.matrix.owners_of(subject)), [0, 1])
+
+
+class MatrixDeadlineTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = FakeGrouperServer(latency=1.0)
+        self.server.add_group('test:group', ['a'])
+        self.grouper = Grouper(await self.server.start())
+        self.group = Group(self.grouper, name='test:group')
+
+    async def asyncTearDown(self):
+        await self.grouper.close()
+        await self.server.stop()
+
+    async def test_streaming_honours_the_timeout(self):
+        for streaming in (False, True):
+            with self.assertRaises(GrouperTimeoutException):
+                await self.grouper.get_membership_matrix([Subject(id='a')], groups=[self.group],
+                                                         streaming=streaming, timeout=0.05)
+
+
+if __name__ == '__main__':
+    unittest.main()
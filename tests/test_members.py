@@ -0,0 +1,50 @@
+import unittest
+
+from aiohttp import web
+
+from aiogrouper import Grouper, Group, Subject
+from aiogrouper.enum import ResultCode
+from aiogrouper.exceptions import GrouperHTTPException, GrouperMembershipException
+from benchmarks.fake_server import FakeGrouperServer
+
+
+class FailingServer(FakeGrouperServer):
+    def add_members(self, group_name, request):
+        if any(lookup.get('subjectId') == 'bad' for lookup in request['subjectLookups']):
+            raise web.HTTPServiceUnavailable()
+        return super().add_members(group_name, request)
+
+    _member_handlers = dict(FakeGrouperServer._member_handlers, WsRestAddMemberRequest=add_members)
+
+
+class MemberBatchTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = FailingServer()
+        self.server.add_group('test:group')
+        self.grouper = Grouper(await self.server.start(), member_batch_size=2, member_concurrency=1)
+        self.group = Group(self.grouper, name='test:group')
+
+    async def asyncTearDown(self):
+        await self.grouper.close()
+        await self.server.stop()
+
+    async def test_failed_batches_dont_lose_the_others(self):
+        subjects = [Subject(id=subject_id) for subject_id in ('a', 'b', 'bad', 'c', 'd', 'e')]
+        with self.assertRaises(GrouperMembershipException) as context:
+            await self.grouper.add_members(self.group, subjects)
+        results, errors = context.exception.results, context.exception.errors
+        self.assertEqual([s.id for s in results], ['a', 'b', 'd', 'e'])
+        self.assertTrue(all(result_code == ResultCode.success for result_code in results.values()))
+        self.assertEqual([s.id for s in errors], ['bad', 'c'])
+        self.assertIsInstance(errors[Subject(id='c')], GrouperHTTPException)
+        self.assertEqual(list(self.server.members['test:group']), ['a', 'b', 'd', 'e'])
+
+    async def test_replacing_batch_results_are_kept(self):
+        subjects = [Subject(id=subject_id) for subject_id in ('a', 'b', 'bad', 'c')]
+        with self.assertRaises(GrouperMembershipException) as context:
+            await self.grouper.add_members(self.group, subjects, replace_existing=True)
+        self.assertEqual([s.id for s in context.exception.results], ['a', 'b'])
+
+
+if __name__ == '__main__':
+    unittest.main()
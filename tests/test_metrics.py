@@ -0,0 +1,61 @@
+import asyncio
+import unittest
+
+from aiogrouper import Grouper, Group, HedgePolicy, Observer, Subject
+from benchmarks.fake_server import FakeGrouperServer
+
+
+class Recorder(Observer):
+    def __init__(self):
+        self.events = []
+
+    def request_completed(self, event):
+        self.events.append((event, event.network_time))
+
+
+class SlowFirstServer(FakeGrouperServer):
+    def __init__(self, delays, **kwargs):
+        super().__init__(**kwargs)
+        self.delays = list(delays)
+
+    async def _delay(self, items):
+        await asyncio.sleep(self.delays.pop(0) if self.delays else 0)
+
+
+class ObserverTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = SlowFirstServer([0.2])
+        self.server.add_group('test:group', ['a', 'b'])
+        self.recorder = Recorder()
+        self.hedge_policy = HedgePolicy()
+        self.grouper = Grouper(await self.server.start(), observers=[self.recorder], hedge_policy=self.hedge_policy)
+        self.group = Group(self.grouper, name='test:group')
+
+    async def asyncTearDown(self):
+        await self.grouper.close()
+        await self.server.stop()
+
+    async def test_streamed_requests_are_observed(self):
+        self.server.delays = []
+        results = await self.grouper.get_memberships([Subject(id='a'), Subject(id='b')], groups=[self.group],
+                                                     streaming=True)
+        self.assertEqual(len(results), 2)
+        (event, _), = self.recorder.events
+        self.assertEqual(event.operation, 'WsRestGetMembershipsRequest')
+        self.assertEqual((event.status, event.result_code, event.object_count), (200, 'SUCCESS', 2))
+        self.assertGreater(event.response_bytes, 0)
+        self.assertGreater(event.parse_time, 0)
+
+    async def test_hedge_loser_doesnt_change_the_event(self):
+        self.hedge_policy._delays['WsRestFindGroupsRequest'] = 0.02
+        await self.grouper.find_groups(groups=[self.group])
+        # Let the cancelled first copy finish
+        await asyncio.sleep(0.05)
+        (event, network_time), = self.recorder.events
+        self.assertTrue(event.hedge_won)
+        self.assertEqual(event.network_time, network_time)
+        self.assertLess(network_time, 0.2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+
+from aiogrouper import Grouper, Group, PageIterator
+from benchmarks.fake_server import FakeGrouperServer
+
+
+class QueryRecordingServer(FakeGrouperServer):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.queries = []
+
+    def get_members(self, group_name, query):
+        self.queries.append(dict(query))
+        return super().get_members(group_name, query)
+
+
+class IterMembersTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = QueryRecordingServer()
+        self.server.add_group('test:group', ['c', 'a', 'e', 'b', 'd'])
+        self.grouper = Grouper(await self.server.start())
+        self.group = Group(self.grouper, name='test:group')
+
+    async def asyncTearDown(self):
+        await self.grouper.close()
+        await self.server.stop()
+
+    async def test_pages_are_sorted(self):
+        members = [subject.id async for subject in self.grouper.iter_members(self.group, page_size=2)]
+        self.assertEqual(members, ['a', 'b', 'c', 'd', 'e'])
+        self.assertTrue(all(query['sortString'] == 'subjectId' for query in self.server.queries))
+
+    async def test_descending(self):
+        members = [subject.id async for subject in self.grouper.iter_members(self.group, page_size=2,
+                                                                             ascending=False, prefetch=False)]
+        self.assertEqual(members, ['e', 'd', 'c', 'b', 'a'])
+
+
+class PageIteratorTestCase(unittest.IsolatedAsyncioTestCase):
+    async def test_unpaged_response_is_read_once(self):
+        async def fetch_page(page_number):
+            return list(range(5))
+
+        self.assertEqual([item async for item in PageIterator(fetch_page, 2)], list(range(5)))
+
+
+if __name__ == '__main__':
+    unittest.main()
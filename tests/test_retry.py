@@ -0,0 +1,124 @@
+import asyncio
+import unittest
+
+from aiohttp import web
+
+from aiogrouper import CircuitBreaker, Grouper, Group, RetryPolicy
+from aiogrouper.enum import SaveMode
+from aiogrouper.exceptions import GrouperCircuitOpenException, GrouperHTTPException, GrouperSaveException
+from benchmarks.fake_server import FakeGrouperServer
+
+
+class UnavailableServer(FakeGrouperServer):
+    # The next `failures` requests are answered with `status` instead
+    failures, status = 0, 503
+
+    async def handle(self, request):
+        if self.failures:
+            self.failures -= 1
+            self.requests[next(iter(await request.json()))] += 1
+            return web.Response(status=self.status)
+        return await super().handle(request)
+
+
+class RetryTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = UnavailableServer()
+        self.server.add_group('test:group')
+        self.grouper = Grouper(await self.server.start(), retry_policy=RetryPolicy(max_attempts=3, backoff=0))
+        self.group = Group(self.grouper, name='test:group')
+
+    async def asyncTearDown(self):
+        await self.grouper.close()
+        await self.server.stop()
+
+    async def test_reads_are_retried(self):
+        self.server.failures = 2
+        self.assertEqual(len(await self.grouper.find_groups(groups=[self.group])), 1)
+        self.assertEqual(self.server.requests['WsRestFindGroupsRequest'], 3)
+
+    async def test_retries_give_up(self):
+        self.server.failures = 3
+        with self.assertRaises(GrouperHTTPException):
+            await self.grouper.find_groups(groups=[self.group])
+        self.assertEqual(self.server.requests['WsRestFindGroupsRequest'], 3)
+
+    async def test_inserts_arent_retried(self):
+        self.server.failures = 1
+        with self.assertRaises(GrouperSaveException):
+            await self.grouper.save_groups([Group(self.grouper, name='test:new')], SaveMode.insert)
+        self.assertEqual(self.server.requests['WsRestGroupSaveRequest'], 1)
+
+    async def test_updates_are_retried(self):
+        self.server.failures = 1
+        await self.grouper.save_groups([Group(self.grouper, name='test:new')], SaveMode.insert_or_update)
+        self.assertEqual(self.server.requests['WsRestGroupSaveRequest'], 2)
+
+    async def test_client_errors_arent_retried(self):
+        self.server.failures, self.server.status = 1, 400
+        with self.assertRaises(GrouperHTTPException):
+            await self.grouper.find_groups(groups=[self.group])
+        self.assertEqual(self.server.requests['WsRestFindGroupsRequest'], 1)
+
+
+class CircuitBreakerTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = UnavailableServer()
+        self.server.add_group('test:group')
+        self.circuit_breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+        self.grouper = Grouper(await self.server.start(), circuit_breaker=self.circuit_breaker)
+        self.group = Group(self.grouper, name='test:group')
+
+    async def asyncTearDown(self):
+        await self.grouper.close()
+        await self.server.stop()
+
+    async def find_groups(self):
+        return await self.grouper.find_groups(groups=[self.group])
+
+    async def open_circuit(self):
+        self.server.failures = 2
+        for _ in range(2):
+            with self.assertRaises(GrouperHTTPException):
+                await self.find_groups()
+        self.assertEqual(self.circuit_breaker.state, CircuitBreaker.open)
+
+    async def test_opens_and_fails_fast(self):
+        await self.open_circuit()
+        with self.assertRaises(GrouperCircuitOpenException):
+            await self.find_groups()
+        self.assertEqual(self.server.requests['WsRestFindGroupsRequest'], 2)
+
+    async def test_successful_trial_closes(self):
+        await self.open_circuit()
+        await asyncio.sleep(0.06)
+        self.server.latency = 0.05
+        trial = asyncio.ensure_future(self.find_groups())
+        await asyncio.sleep(0.02)
+        self.assertEqual(self.circuit_breaker.state, CircuitBreaker.half_open)
+        # Only one trial at a time
+        with self.assertRaises(GrouperCircuitOpenException):
+            await self.find_groups()
+        await trial
+        self.assertEqual((self.circuit_breaker.state, self.circuit_breaker.failures), (CircuitBreaker.closed, 0))
+
+    async def test_failed_trial_reopens(self):
+        await self.open_circuit()
+        await asyncio.sleep(0.06)
+        self.server.failures = 1
+        with self.assertRaises(GrouperHTTPException):
+            await self.find_groups()
+        self.assertEqual((self.circuit_breaker.state, self.circuit_breaker.times_opened), (CircuitBreaker.open, 2))
+        with self.assertRaises(GrouperCircuitOpenException):
+            await self.find_groups()
+
+    async def test_client_errors_dont_count(self):
+        self.server.failures, self.server.status = 3, 400
+        for _ in range(3):
+            with self.assertRaises(GrouperHTTPException):
+                await self.find_groups()
+        self.assertEqual((self.circuit_breaker.state, self.circuit_breaker.failures), (CircuitBreaker.closed, 0))
+
+
+if __name__ == '__main__':
+    unittest.main()
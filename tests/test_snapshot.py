@@ -0,0 +1,78 @@
+import os
+import tempfile
+import unittest
+
+from aiogrouper import ChangeFeed, Grouper, Group, MembershipEvent
+from benchmarks.fake_server import FakeGrouperServer
+
+
+class DuplicatingServer(FakeGrouperServer):
+    def get_members(self, group_name, query):
+        response = super().get_members(group_name, query)
+        subjects = response['WsGetMembersLiteResult']['wsSubjects']
+        subjects.extend(subjects[:1])
+        return response
+
+
+class ChangeFeedTestCase(unittest.IsolatedAsyncioTestCase):
+    server_class = FakeGrouperServer
+
+    async def asyncSetUp(self):
+        self.server = self.server_class()
+        self.server.add_group('test:group', ['a', 'b'])
+        self.grouper = Grouper(await self.server.start())
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, 'snapshots.json')
+
+    async def asyncTearDown(self):
+        await self.grouper.close()
+        await self.server.stop()
+        self.directory.cleanup()
+
+    def change_feed(self):
+        return ChangeFeed(self.grouper, [Group(self.grouper, name='test:group')], path=self.path)
+
+    async def test_uncommitted_changes_are_reported_again(self):
+        feed = self.change_feed()
+        first = await feed.poll()
+        self.assertEqual(set(first), {MembershipEvent(MembershipEvent.add, 'test:group', 'a'),
+                                      MembershipEvent(MembershipEvent.add, 'test:group', 'b')})
+        self.assertFalse(os.path.exists(self.path))
+        self.assertEqual(set(await feed.poll()), set(first))
+        feed.commit(first)
+        self.assertEqual(list(await feed.poll()), [])
+
+    async def test_changes_since_commit(self):
+        feed = self.change_feed()
+        feed.commit(await feed.poll())
+        del self.server.members['test:group']['a']
+        self.server.members['test:group']['c'] = True
+        changes = await feed.poll()
+        self.assertEqual(list(changes), [MembershipEvent(MembershipEvent.remove, 'test:group', 'a'),
+                                         MembershipEvent(MembershipEvent.add, 'test:group', 'c')])
+        feed.commit(changes)
+        # A restart carries on from the last commit
+        self.assertEqual(list(await self.change_feed().poll()), [])
+
+    async def test_stale_commit_is_ignored(self):
+        feed = self.change_feed()
+        feed.commit(await feed.poll())
+        stale = await feed.poll()
+        self.server.members['test:group']['c'] = True
+        feed.commit(await feed.poll())
+        feed.commit(stale)
+        self.assertEqual(feed.store.get('test:group').members, {'a', 'b', 'c'})
+
+
+class DuplicateMembersTestCase(ChangeFeedTestCase):
+    server_class = DuplicatingServer
+
+    async def test_duplicates_dont_change_the_digest(self):
+        feed = self.change_feed()
+        feed.commit(await feed.poll())
+        await feed.poll()
+        self.assertEqual(feed.unchanged, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
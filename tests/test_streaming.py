@@ -0,0 +1,78 @@
+import asyncio
+import copy
+import json
+import time
+import unittest
+
+from aiogrouper import CircuitBreaker, Grouper, Group, MembershipParser, Subject
+from benchmarks.fake_server import FakeGrouperServer
+
+RESPONSE = {'WsGetMembershipsResults': {
+    'resultMetadata': {'success': 'T', 'resultCode': 'SUCCESS'},
+    'wsGroups': [{'name': 'test:group', 'uuid': 'G'}],
+    'wsStems': [{'name': 'test', 'uuid': 'S'}],
+    'wsSubjects': [{'id': 'a', 'sourceId': 'fake'}, {'id': 'b', 'sourceId': 'fake'}],
+    'wsMemberships': [{'subjectId': 'a', 'groupId': 'G'}, {'subjectId': 'b', 'groupId': 'G'},
+                      {'subjectId': 'b', 'ownerStemId': 'S'}],
+}}
+
+
+def names(pairs):
+    return sorted((subject.id, owner.name) for subject, owner in pairs)
+
+
+class MembershipParserTestCase(unittest.IsolatedAsyncioTestCase):
+    expected = [('a', 'test:group'), ('b', 'test'), ('b', 'test:group')]
+
+    async def asyncSetUp(self):
+        self.grouper = Grouper('http://grouper.invalid/')
+
+    async def asyncTearDown(self):
+        await self.grouper.close()
+
+    def test_parse_leaves_the_response_alone(self):
+        response = copy.deepcopy(RESPONSE)
+        self.assertEqual(names(MembershipParser(self.grouper).parse(response)), self.expected)
+        self.assertEqual(response, RESPONSE)
+
+    def test_incremental_and_buffered(self):
+        body = json.dumps(RESPONSE).encode()
+        for incremental in (True, False):
+            parser = MembershipParser(self.grouper, incremental=incremental)
+            pairs = []
+            for i in range(0, len(body), 50):
+                pairs.extend(parser.feed(body[i:i + 50]))
+            pairs.extend(parser.close())
+            self.assertEqual(names(pairs), self.expected)
+
+
+class StreamingTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = FakeGrouperServer()
+        self.server.add_group('test:group', ['a'])
+        self.circuit_breaker = CircuitBreaker()
+        self.grouper = Grouper(await self.server.start(), max_in_flight=1, circuit_breaker=self.circuit_breaker)
+        self.group = Group(self.grouper, name='test:group')
+
+    async def asyncTearDown(self):
+        await self.grouper.close()
+        await self.server.stop()
+
+    def get_memberships(self):
+        return self.grouper.get_memberships([Subject(id='a')], groups=[self.group], streaming=True)
+
+    async def test_cancelled_trial_is_given_up(self):
+        self.circuit_breaker.state = CircuitBreaker.open
+        self.circuit_breaker.opened_at = time.monotonic() - self.circuit_breaker.reset_timeout
+        await self.grouper.limiter.acquire()
+        with self.assertRaises(asyncio.TimeoutError):
+            await asyncio.wait_for(self.get_memberships(), 0.05)
+        self.assertEqual(self.circuit_breaker.state, CircuitBreaker.half_open)
+        self.grouper.limiter.release()
+        self.assertEqual(len(await self.get_memberships()), 1)
+        self.assertEqual(self.circuit_breaker.state, CircuitBreaker.closed)
+        self.assertEqual(self.grouper.limiter.in_flight, 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
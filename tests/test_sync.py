@@ -0,0 +1,45 @@
+import concurrent.futures
+import unittest
+
+from aiogrouper import BackgroundLoop, Group, Subject, SyncGrouper
+from benchmarks.fake_server import FakeGrouperServer
+
+
+class SyncGrouperTestCase(unittest.TestCase):
+    def setUp(self):
+        self.background_loop = BackgroundLoop()
+        self.server = FakeGrouperServer()
+        self.server.add_group('test:group', ['a', 'b', 'c'])
+        # The server runs on the background loop too, as the test's own thread blocks on each call
+        url = self.background_loop.run(self.server.start())
+        self.grouper = SyncGrouper(url, background_loop=self.background_loop, iterator_batch_size=2)
+        self.group = Group(self.grouper.grouper, name='test:group')
+
+    def tearDown(self):
+        self.grouper.close()
+        self.background_loop.run(self.server.stop())
+        self.background_loop.close()
+
+    def test_blocking_calls(self):
+        self.assertEqual([g.name for g in self.grouper.find_groups(groups=[self.group])], ['test:group'])
+        self.assertEqual([s.id for s in self.grouper.get_members(self.group)], ['a', 'b', 'c'])
+        self.grouper.add_members(self.group, [Subject(id='d')])
+        self.assertTrue(self.grouper.has_member(self.group, Subject(id='d')))
+
+    def test_iterating(self):
+        with self.grouper.iter_members(self.group, page_size=2) as members:
+            self.assertEqual([s.id for s in members], ['a', 'b', 'c'])
+        with self.grouper.iter_members(self.group, page_size=2) as members:
+            self.assertEqual(next(members).id, 'a')
+        # Closed part-way through
+        self.assertEqual(list(members), [])
+
+    def test_from_threads(self):
+        with concurrent.futures.ThreadPoolExecutor(4) as executor:
+            results = list(executor.map(lambda subject_id: self.grouper.has_member(self.group, Subject(id=subject_id)),
+                                        ['a', 'b', 'c', 'd']))
+        self.assertEqual(results, [True, True, True, False])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import asyncio
+import unittest
+
+from aiohttp import web
+
+from aiogrouper import Grouper, Stem, StemToSave
+from aiogrouper.exceptions import GrouperHTTPException
+from benchmarks.fake_server import FakeGrouperServer
+
+
+class FlakyServer(FakeGrouperServer):
+    fail = False
+
+    def find_stems(self, request):
+        if self.fail and 'wsStemQueryFilter' in request:
+            raise web.HTTPServiceUnavailable()
+        return super().find_stems(request)
+
+    _handlers = dict(FakeGrouperServer._handlers, WsRestFindStemsRequest=find_stems)
+
+
+class StemTreeTestCase(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self):
+        self.server = FlakyServer()
+        for name in ('root:a:x', 'root:a:y', 'root:b'):
+            self.server.add_stem(name)
+        self.grouper = Grouper(await self.server.start())
+        self.tree = await self.grouper.load_stem_tree(Stem(self.grouper, name='root'))
+
+    async def asyncTearDown(self):
+        await self.grouper.close()
+        await self.server.stop()
+
+    def names(self):
+        return sorted(stem.name for stem in self.tree)
+
+    async def test_load(self):
+        self.assertEqual(self.names(), ['root', 'root:a', 'root:a:x', 'root:a:y', 'root:b'])
+        self.assertEqual([s.name for s in self.tree.children('root:a')], ['root:a:x', 'root:a:y'])
+
+    async def test_tree_is_whole_during_refresh(self):
+        self.server.add_stem('root:a:z')
+        self.server.latency = 0.05
+        refresh = asyncio.ensure_future(self.tree.refresh(Stem(self.grouper, name='root:a')))
+        await asyncio.sleep(0.07)
+        self.assertFalse(refresh.done())
+        self.assertEqual(len(self.tree), 5)
+        self.assertIn('root:a:x', self.tree)
+        await refresh
+        self.assertEqual(len(self.tree), 6)
+
+    async def test_failed_refresh_keeps_the_tree(self):
+        self.tree.stale.add('root:a')
+        self.server.fail = True
+        with self.assertRaises(GrouperHTTPException):
+            await self.tree.refresh()
+        self.assertEqual(len(self.tree), 5)
+        self.assertEqual(self.tree.stale, {'root:a'})
+        self.server.fail = False
+        await self.tree.refresh()
+        self.assertEqual(self.tree.stale, set())
+
+    async def test_rename(self):
+        await self.grouper.save_stem(StemToSave(Stem(self.grouper, name='root:c'),
+                                                stem_lookup=Stem(self.grouper, name='root:a')))
+        self.assertEqual(self.names(), ['root', 'root:b', 'root:c', 'root:c:x', 'root:c:y'])
+
+
+if __name__ == '__main__':
+    unittest.main()